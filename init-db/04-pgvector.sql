@@ -8,7 +8,7 @@ CREATE TABLE IF NOT EXISTS document_chunks (
     chunk_id VARCHAR(255) UNIQUE NOT NULL,  -- Format: {doc_id}_{chunk_index}
     chunk_index INTEGER NOT NULL,
     chunk_text TEXT NOT NULL,
-    dense_embedding vector(1024),  -- BGE-M3 dense embeddings
+    dense_embedding halfvec(1024),  -- BGE-M3 dense embeddings, stored as fp16
     sparse_embedding JSONB NOT NULL DEFAULT '{}',  -- BGE-M3 sparse embeddings (30k dimensions as JSONB)
     chunk_metadata JSONB NOT NULL DEFAULT '{}',
     created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
@@ -18,7 +18,7 @@ CREATE TABLE IF NOT EXISTS document_chunks (
 -- Create HNSW index for dense embeddings (cosine similarity)
 CREATE INDEX IF NOT EXISTS idx_dense_embedding_hnsw 
     ON document_chunks 
-    USING hnsw (dense_embedding vector_cosine_ops)
+    USING hnsw (dense_embedding halfvec_cosine_ops)
     WITH (m = 16, ef_construction = 64);
 
 -- Create GIN index for JSONB metadata searching
@@ -2,13 +2,14 @@ import json
 import logging
 import re
 import asyncio
+import bisect
 import queue # <-- Add queue import
 import inspect # <-- Add inspect import
-import difflib # <-- Make sure to import this at the top of the file
 from pathlib import Path
 from typing import Optional, List, Dict, Any, Tuple, Callable, Awaitable, Set # Added Callable, Awaitable, Set
 from pydantic import ValidationError
 from collections import defaultdict, deque # Added defaultdict and deque
+from rapidfuzz import fuzz
 
 # Import the JSON utilities
 from ai_researcher.agentic_layer.utils.json_utils import (
@@ -39,6 +40,94 @@ from ai_researcher.agentic_layer.schemas.thought import ThoughtEntry # Added imp
 
 logger = logging.getLogger(__name__) # <-- Initialize logger
 
+# Minimum partial_ratio score (0-100) for a chunk to count as found in its document
+CHUNK_MATCH_MIN_SCORE = 80
+# Length of the exact-match probes used to narrow the fuzzy search for long chunks
+CHUNK_SEED_LENGTH = 32
+
+_WS_RE = re.compile(r'\s+')
+_MULTI_WS_RE = re.compile(r'\s{2,}')
+
+
+def _locate_chunk(chunk: str, document: str) -> Optional[Tuple[int, int, float]]:
+    """
+    Finds where a chunk sits in a document, returning (start, end, score) or None
+    when nothing scores at least CHUNK_MATCH_MIN_SCORE. Stored chunks usually
+    appear verbatim once whitespace is normalized, so an exact str.find (a
+    linear-time C search) is tried before the fuzzy alignment.
+    """
+    if not chunk:
+        return None
+    start = document.find(chunk)
+    if start != -1:
+        return start, start + len(chunk), 100.0
+    seeded = _locate_chunk_near_seeds(chunk, document)
+    if seeded is not None:
+        return seeded
+    # Best-aligned substring of the document, scored in RapidFuzz's C++ core
+    alignment = fuzz.partial_ratio_alignment(chunk, document, score_cutoff=CHUNK_MATCH_MIN_SCORE)
+    if alignment is None:
+        return None
+    return alignment.dest_start, alignment.dest_end, alignment.score
+
+
+def _locate_chunk_near_seeds(chunk: str, document: str) -> Optional[Tuple[int, int, float]]:
+    """
+    Aligns a long chunk only around exact hits of short probes taken from its
+    start, middle and end, so a chunk with a few edits skips the scan of the
+    whole document. Returns None when no probe leads to a confident match.
+    """
+    if len(chunk) < 2 * CHUNK_SEED_LENGTH:
+        return None
+    for offset in (0, (len(chunk) - CHUNK_SEED_LENGTH) // 2, len(chunk) - CHUNK_SEED_LENGTH):
+        hit = document.find(chunk[offset:offset + CHUNK_SEED_LENGTH])
+        if hit == -1:
+            continue
+        # Leave half a chunk of slack on each side for insertions and deletions
+        region_start = max(0, hit - offset - len(chunk) // 2)
+        region_end = min(len(document), hit - offset + len(chunk) + len(chunk) // 2)
+        alignment = fuzz.partial_ratio_alignment(
+            chunk, document[region_start:region_end], score_cutoff=CHUNK_MATCH_MIN_SCORE
+        )
+        if alignment is not None:
+            return region_start + alignment.dest_start, region_start + alignment.dest_end, alignment.score
+    return None
+
+
+class _NormalizedText:
+    """
+    Text with every whitespace run collapsed to one space, plus the mapping of
+    positions back to the original. The collapsing is a single C-level regex
+    substitution; only runs of two or more whitespace characters shift later
+    positions, so the mapping records just those shifts and a lookup is one bisect.
+    """
+    def __init__(self, original: str):
+        self.text = _WS_RE.sub(' ', original)
+        self._original_length = len(original)
+        # Normalized position just past each multi-character run, and the total
+        # shift from the original for positions from there on
+        self._run_ends: List[int] = []
+        self._shifts: List[int] = []
+        shift = 0
+        for match in _MULTI_WS_RE.finditer(original):
+            self._run_ends.append(match.start() - shift + 1)
+            shift += match.end() - match.start() - 1
+            self._shifts.append(shift)
+
+    def to_original(self, norm_pos: int) -> int:
+        """Original position of the character at norm_pos (the original length past the end)."""
+        if norm_pos >= len(self.text):
+            return self._original_length
+        run = bisect.bisect_right(self._run_ends, norm_pos)
+        return norm_pos + (self._shifts[run - 1] if run else 0)
+
+    def span_to_original(self, norm_start: int, norm_end: int) -> Tuple[int, int]:
+        """Maps a half-open normalized span onto the original text."""
+        if norm_end <= norm_start:
+            start = self.to_original(norm_start)
+            return start, start
+        return self.to_original(norm_start), self.to_original(norm_end - 1) + 1
+
 class ResearchAgent(BaseAgent):
     """
     Agent responsible for executing research steps: using tools for information
@@ -282,16 +371,13 @@ If you DO NOT receive 'Focus Questions' but receive 'Existing Relevant Notes':
                     logger.warning(f"Document result missing original_filename in metadata: {doc_result.get('id')}")
 
             # --- Process Each Document (Extract Windows, Schedule Note Gen) ---
-            for filename, chunks in doc_results_by_file.items():
-                logger.info(f"Processing {len(chunks)} chunks from document: {filename}")
-                # Extract content windows for this document, passing the callback and registry override
-                content_windows = await self._extract_content_windows(
-                    filename,
-                    chunks,
-                    feedback_callback,
-                    log_queue=log_queue, # <-- Pass log_queue
-                    tool_registry_override=tool_registry # Pass the override
-                )
+            # Extract content windows for all documents concurrently, passing the callback and registry override
+            for filename, content_windows in await self._extract_content_windows_by_file(
+                doc_results_by_file,
+                feedback_callback,
+                log_queue=log_queue, # <-- Pass log_queue
+                tool_registry_override=tool_registry # Pass the override
+            ):
 
                 # Schedule note generation for each window
                 for window in content_windows:
@@ -433,16 +519,13 @@ If you DO NOT receive 'Focus Questions' but receive 'Existing Relevant Notes':
                             logger.warning(f"Proactive search: Document result missing original_filename: {doc_result.get('id')}")
 
                     # --- Process Each Document (Extract Windows, Schedule Note Gen - Cycle 1) ---
-                    for filename, chunks in proactive_doc_results_by_file.items():
-                        logger.info(f"Proactive search: Processing {len(chunks)} chunks from document: {filename}")
-                        # Pass callback and registry override
-                        content_windows = await self._extract_content_windows(
-                            filename,
-                            chunks,
-                    feedback_callback,
-                    log_queue=log_queue, # <-- Pass log_queue
-                    tool_registry_override=tool_registry # Pass the override
-                )
+                    # Pass callback and registry override
+                    for filename, content_windows in await self._extract_content_windows_by_file(
+                        proactive_doc_results_by_file,
+                        feedback_callback,
+                        log_queue=log_queue, # <-- Pass log_queue
+                        tool_registry_override=tool_registry # Pass the override
+                    ):
 
                         for window in content_windows:
                             # Create a unique window ID (still useful internally if needed) and get doc_id
@@ -623,10 +706,9 @@ If you DO NOT receive 'Focus Questions' but receive 'Existing Relevant Notes':
             else:
                 logger.warning(f"Document result missing original_filename in metadata: {doc_result.get('id')}")
 
-        for filename, chunks in doc_results_by_file.items():
-            content_windows = await self._extract_content_windows(
-                filename, chunks, feedback_callback, log_queue=log_queue, tool_registry_override=tool_registry, update_callback=update_callback
-            )
+        for filename, content_windows in await self._extract_content_windows_by_file(
+            doc_results_by_file, feedback_callback, log_queue=log_queue, tool_registry_override=tool_registry, update_callback=update_callback
+        ):
             for window in content_windows:
                 first_chunk_id = window["original_chunk_ids"][0] if window["original_chunk_ids"] else "unknown"
                 window_metadata = {
@@ -938,17 +1020,14 @@ Now, generate the questions for the provided research request.
                 logger.warning(f"Initial exploration: Document result missing original_filename: {doc_result.get('id')}")
 
         # --- Process Each Document (Extract Windows, Schedule Note Gen - Initial Exploration) ---
-        for filename, chunks in initial_doc_results_by_file.items():
-            logger.info(f"Initial exploration: Processing {len(chunks)} chunks from document: {filename}")
-            # Pass callback and registry override
-            content_windows = await self._extract_content_windows(
-                filename,
-                chunks,
-                    feedback_callback,
-                    log_queue=log_queue, # <-- Pass log_queue
-                    tool_registry_override=tool_registry, # Pass the override
-                    update_callback=update_callback # <-- Pass update_callback
-                )
+        # Pass callback and registry override
+        for filename, content_windows in await self._extract_content_windows_by_file(
+            initial_doc_results_by_file,
+            feedback_callback,
+            log_queue=log_queue, # <-- Pass log_queue
+            tool_registry_override=tool_registry, # Pass the override
+            update_callback=update_callback # <-- Pass update_callback
+        ):
 
             for window in content_windows:
                 # Create a unique window ID (still useful internally if needed) and get doc_id
@@ -1131,6 +1210,35 @@ If no relevant sub-questions are identified, return an empty list for "sub_quest
         return relevant_notes_with_context, new_sub_questions, updated_scratchpad, execution_details
 
 
+    async def _extract_content_windows_by_file(
+        self,
+        chunks_by_file: Dict[str, List[Dict[str, Any]]],
+        feedback_callback: Optional[Callable[[Dict[str, Any]], None]] = None,
+        log_queue: Optional[queue.Queue] = None,
+        tool_registry_override: Optional[ToolRegistry] = None,
+        update_callback: Optional[Callable] = None
+    ) -> List[Tuple[str, List[Dict[str, Any]]]]:
+        """
+        Runs _extract_content_windows for every document concurrently, so the
+        full-document reads overlap instead of running one after another.
+        Returns (filename, windows) pairs in the order of chunks_by_file.
+        """
+        filenames = list(chunks_by_file)
+        for filename in filenames:
+            logger.info(f"Processing {len(chunks_by_file[filename])} chunks from document: {filename}")
+        windows_per_file = await asyncio.gather(*(
+            self._extract_content_windows(
+                filename,
+                chunks_by_file[filename],
+                feedback_callback,
+                log_queue=log_queue,
+                tool_registry_override=tool_registry_override,
+                update_callback=update_callback
+            )
+            for filename in filenames
+        ))
+        return list(zip(filenames, windows_per_file))
+
     async def _extract_content_windows(
         self,
         filename: str,
@@ -1160,11 +1268,22 @@ If no relevant sub-questions are identified, return an empty list for "sub_quest
             logger.warning(f"Could not read full content for {filename}. Cannot extract windows.")
             return []
 
+        # Normalize the document's whitespace once for all of its chunks; matches are
+        # mapped back so windows are still cut from the original text
+        normalized_doc = _NormalizedText(full_content_original)
+
         processed_chunks: Dict[str, Dict[str, Any]] = {}
         window_size = get_research_note_content_limit(self.mission_id)
         max_window_size = get_max_planning_context_chars(self.mission_id)
 
-        for chunk in chunks:
+        # Whitespace-normalized chunk texts by position in `chunks`; a caller-supplied
+        # "text_norm" is used as is and the callers' dicts are never modified
+        normalized_chunks: Dict[int, str] = {
+            index: chunk.get("text_norm") or _WS_RE.sub(' ', chunk["text"]).strip()
+            for index, chunk in enumerate(chunks) if chunk.get("text")
+        }
+
+        for index, chunk in enumerate(chunks):
             chunk_id = chunk.get("id", "unknown")
             chunk_text_to_find = chunk.get("text")
 
@@ -1173,28 +1292,22 @@ If no relevant sub-questions are identified, return an empty list for "sub_quest
                 continue
 
             # --- FUZZY MATCHING LOGIC ---
-            sequence_matcher = difflib.SequenceMatcher(
-                None, chunk_text_to_find, full_content_original, autojunk=False
-            )
-            match = sequence_matcher.find_longest_match(
-                0, len(chunk_text_to_find), 0, len(full_content_original)
-            )
+            match = _locate_chunk(normalized_chunks[index], normalized_doc.text)
 
-            # Confidence check: the size of the longest match should be a high percentage of the chunk's length
-            if match.size < 10 or (match.size / len(chunk_text_to_find)) < 0.8:
+            if match is None:
                 logger.warning(
                     f"Could not find a confident match for chunk {chunk_id} in {filename}. "
-                    f"Match size: {match.size}, Chunk length: {len(chunk_text_to_find)}. Skipping."
+                    f"Chunk length: {len(chunk_text_to_find)}. Skipping."
                 )
                 continue
 
-            chunk_start = match.b
-            chunk_end = match.b + match.size
+            match_start, match_end, match_score = match
+            chunk_start, chunk_end = normalized_doc.span_to_original(match_start, match_end)
 
-            logger.info(f"CHUNK_DEBUG: Found match for chunk {chunk_id} at [{chunk_start}:{chunk_end}] with ratio {sequence_matcher.ratio()}")
+            logger.info(f"CHUNK_DEBUG: Found match for chunk {chunk_id} at [{chunk_start}:{chunk_end}] with score {match_score:.1f}")
 
             # --- WINDOWING LOGIC ---
-            chunk_midpoint = chunk_start + (match.size // 2)
+            chunk_midpoint = (chunk_start + chunk_end) // 2
             half_window = window_size // 2
 
             window_start = max(0, chunk_midpoint - half_window)
@@ -1,7 +1,9 @@
 import asyncio
 from typing import Dict, Any, Optional
 
-from ai_researcher.agentic_layer.model_dispatcher import ModelDispatcher
+import httpx
+
+from ai_researcher.agentic_layer.model_dispatcher import ModelDispatcher, get_shared_dispatcher
 from database.models import User
 
 from ai_researcher.core_rag.embedder import TextEmbedder
@@ -14,9 +16,11 @@ class WritingController:
     configured with their specific API keys and settings.
     """
 
-    def __init__(self, user: User, text_embedder: TextEmbedder, text_reranker: TextReranker):
-        self.user = user
-        self.model_dispatcher = ModelDispatcher(user_settings=user.settings)
+    def __init__(self, user: User, text_embedder: TextEmbedder, text_reranker: TextReranker,
+                 http_client: Optional[httpx.AsyncClient] = None):
+        # Only the user's settings are kept, so the controller can be shared by
+        # every user with identical settings
+        self.model_dispatcher = get_shared_dispatcher(user.settings, http_client=http_client)
         self.text_embedder = text_embedder
         self.text_reranker = text_reranker
 
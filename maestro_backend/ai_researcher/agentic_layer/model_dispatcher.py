@@ -5,6 +5,9 @@ import time
 import logging
 import asyncio
 import json
+import hashlib
+import threading
+import weakref
 import random # <-- Import random for jitter
 import httpx # <-- Import httpx again for pricing fetch
 from decimal import Decimal, InvalidOperation # <-- Import Decimal for accurate cost calculation
@@ -19,13 +22,56 @@ from openai.types.chat.chat_completion import Choice
 # Configure logging - respect LOG_LEVEL environment variable
 logger = logging.getLogger(__name__)
 
+# --- Shared HTTP clients for LLM traffic ---
+# One keep-alive httpx.AsyncClient per event loop, shared by every dispatcher
+# and provider, so calls reuse TCP/TLS connections instead of handshaking per
+# request. Keyed by loop because mission runs use their own loops in worker
+# threads and an AsyncClient's pool cannot be shared across loops. Code that
+# runs its own loop must await close_llm_http_client() before the loop ends.
+_LLM_HTTP_CLIENTS: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = weakref.WeakKeyDictionary()
+_LLM_HTTP_CLIENTS_LOCK = threading.Lock()
+
+try:
+    import h2  # noqa: F401  (enables HTTP/2 in httpx)
+    _HTTP2_AVAILABLE = True
+except ImportError:
+    _HTTP2_AVAILABLE = False
+
+
+def get_llm_http_client() -> Optional[httpx.AsyncClient]:
+    """Returns the shared LLM HTTP client for the running event loop, or None outside a loop."""
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        return None
+    with _LLM_HTTP_CLIENTS_LOCK:
+        client = _LLM_HTTP_CLIENTS.get(loop)
+        if client is None or client.is_closed:
+            client = httpx.AsyncClient(
+                http2=_HTTP2_AVAILABLE,
+                limits=httpx.Limits(max_keepalive_connections=64, max_connections=256),
+                timeout=httpx.Timeout(60.0, connect=5.0),
+            )
+            _LLM_HTTP_CLIENTS[loop] = client
+        return client
+
+
+async def close_llm_http_client() -> None:
+    """Closes and forgets the shared LLM HTTP client of the running event loop, if any."""
+    loop = asyncio.get_running_loop()
+    with _LLM_HTTP_CLIENTS_LOCK:
+        client = _LLM_HTTP_CLIENTS.pop(loop, None)
+    if client is not None and not client.is_closed:
+        await client.aclose()
+
 class ModelDispatcher:
     """
     Handles interactions with configured LLM APIs (OpenRouter and/or Local) asynchronously.
     Selects appropriate models and clients based on agent mode/request and manages API calls.
     This version is initialized with user-specific settings to allow for per-user API keys.
     """
-    def __init__(self, user_settings: Dict[str, Any], semaphore: Optional[asyncio.Semaphore] = None, context_manager=None):
+    def __init__(self, user_settings: Dict[str, Any], semaphore: Optional[asyncio.Semaphore] = None, context_manager=None,
+                 http_client: Optional[httpx.AsyncClient] = None):
         self.max_retries = config.MAX_RETRIES
         self.retry_delay = config.RETRY_DELAY
         self.clients: Dict[str, Optional[AsyncOpenAI]] = {}
@@ -33,6 +79,9 @@ class ModelDispatcher:
         self.context_manager = context_manager
         self.model_pricing_cache: Dict[str, Dict[str, Decimal]] = {}
         self.user_settings = user_settings
+        # Fallback for clients built outside a running loop (e.g. in sync dependencies);
+        # it must belong to the loop the dispatcher is used on
+        self.http_client = http_client
 
         # Determine the providers to initialize based on user settings and system config
         providers_in_use = self._get_providers_from_settings()
@@ -80,7 +129,8 @@ class ModelDispatcher:
                 client = AsyncOpenAI(
                     base_url=base_url,
                     api_key=api_key,
-                    timeout=config.LLM_REQUEST_TIMEOUT
+                    timeout=config.LLM_REQUEST_TIMEOUT,
+                    http_client=self._http_client()
                 )
                 self.clients[provider_name] = client
                 logger.info(f"AsyncOpenAI client initialized successfully for provider: {provider_name} at {base_url}")
@@ -88,6 +138,10 @@ class ModelDispatcher:
                 logger.error(f"Error initializing AsyncOpenAI client for provider {provider_name}: {e}", exc_info=True)
                 self.clients[provider_name] = None
 
+    def _http_client(self) -> Optional[httpx.AsyncClient]:
+        """HTTP client for new provider clients; None lets the OpenAI SDK create its own."""
+        return get_llm_http_client() or self.http_client
+
     def _get_providers_from_settings(self) -> set:
         """Determines which providers to configure based on user and global settings."""
         providers = set()
@@ -186,7 +240,8 @@ class ModelDispatcher:
             client = AsyncOpenAI(
                 base_url=base_url,
                 api_key=api_key,
-                timeout=config.LLM_REQUEST_TIMEOUT
+                timeout=config.LLM_REQUEST_TIMEOUT,
+                http_client=self._http_client()
             )
             # Update the cached client
             self.clients[provider_name] = client
@@ -315,45 +370,45 @@ class ModelDispatcher:
         models_url = f"{base_url.rstrip('/')}/models"
         headers = {"Authorization": f"Bearer {api_key}"}
 
-        # Create a new HTTP client for this request with a timeout
-        async with httpx.AsyncClient(timeout=config.LLM_REQUEST_TIMEOUT) as client:
-            try:
-                logger.info(f"Fetching model pricing from {models_url}...")
-                response = await client.get(models_url, headers=headers)
-                response.raise_for_status()
-                models_data = response.json()
-
-                if not isinstance(models_data, dict) or "data" not in models_data or not isinstance(models_data["data"], list):
-                    logger.error(f"Unexpected format received from OpenRouter /models endpoint: {models_data}")
-                    return
-
-                new_cache: Dict[str, Dict[str, Decimal]] = {}
-                for model_info in models_data["data"]:
-                    model_id = model_info.get("id")
-                    pricing = model_info.get("pricing")
-                    if model_id and isinstance(pricing, dict):
-                        try:
-                            # Use Decimal for precision, default to 0 if price is missing/invalid
-                            prompt_cost = Decimal(pricing.get("prompt", "0"))
-                            completion_cost = Decimal(pricing.get("completion", "0"))
-                            new_cache[model_id] = {
-                                "prompt": prompt_cost,
-                                "completion": completion_cost,
-                            }
-                        except (InvalidOperation, TypeError) as e:
-                            logger.warning(f"Could not parse pricing for model '{model_id}': {pricing}. Error: {e}. Setting costs to 0.")
-                            new_cache[model_id] = {"prompt": Decimal("0"), "completion": Decimal("0")} # Store default on error
-
-                # Update the cache directly (removed lock)
-                self.model_pricing_cache = new_cache
-                logger.info(f"Successfully fetched and cached pricing for {len(self.model_pricing_cache)} models from OpenRouter.")
-
-            except httpx.RequestError as e:
-                logger.error(f"Error fetching OpenRouter model pricing (Request Error): {e}", exc_info=True)
-            except httpx.HTTPStatusError as e:
-                logger.error(f"Error fetching OpenRouter model pricing (HTTP Status {e.response.status_code}): {e.response.text}", exc_info=True)
-            except Exception as e: # Catch broader exceptions like JSONDecodeError
-                logger.error(f"Unexpected error fetching or processing OpenRouter model pricing: {e}", exc_info=True)
+        # Reuse the shared keep-alive client of this event loop
+        client = self._http_client()
+        try:
+            logger.info(f"Fetching model pricing from {models_url}...")
+            response = await client.get(models_url, headers=headers, timeout=config.LLM_REQUEST_TIMEOUT)
+            response.raise_for_status()
+            models_data = response.json()
+
+            if not isinstance(models_data, dict) or "data" not in models_data or not isinstance(models_data["data"], list):
+                logger.error(f"Unexpected format received from OpenRouter /models endpoint: {models_data}")
+                return
+
+            new_cache: Dict[str, Dict[str, Decimal]] = {}
+            for model_info in models_data["data"]:
+                model_id = model_info.get("id")
+                pricing = model_info.get("pricing")
+                if model_id and isinstance(pricing, dict):
+                    try:
+                        # Use Decimal for precision, default to 0 if price is missing/invalid
+                        prompt_cost = Decimal(pricing.get("prompt", "0"))
+                        completion_cost = Decimal(pricing.get("completion", "0"))
+                        new_cache[model_id] = {
+                            "prompt": prompt_cost,
+                            "completion": completion_cost,
+                        }
+                    except (InvalidOperation, TypeError) as e:
+                        logger.warning(f"Could not parse pricing for model '{model_id}': {pricing}. Error: {e}. Setting costs to 0.")
+                        new_cache[model_id] = {"prompt": Decimal("0"), "completion": Decimal("0")} # Store default on error
+
+            # Update the cache directly (removed lock)
+            self.model_pricing_cache = new_cache
+            logger.info(f"Successfully fetched and cached pricing for {len(self.model_pricing_cache)} models from OpenRouter.")
+
+        except httpx.RequestError as e:
+            logger.error(f"Error fetching OpenRouter model pricing (Request Error): {e}", exc_info=True)
+        except httpx.HTTPStatusError as e:
+            logger.error(f"Error fetching OpenRouter model pricing (HTTP Status {e.response.status_code}): {e.response.text}", exc_info=True)
+        except Exception as e: # Catch broader exceptions like JSONDecodeError
+            logger.error(f"Unexpected error fetching or processing OpenRouter model pricing: {e}", exc_info=True)
 
     async def _ensure_pricing_loaded(self):
         """Ensures the pricing cache is populated, fetching if necessary."""
@@ -840,3 +895,29 @@ class ModelDispatcher:
         except Exception as e:
             logger.error(f"Unexpected error during streaming LLM call: {e}", exc_info=True)
             raise e
+
+
+# --- Shared dispatchers ---
+# Users with identical settings (common in team deployments) share one
+# dispatcher and therefore one set of provider clients and connection pools.
+# Entries disappear once no controller holds a reference to the dispatcher.
+_DISPATCHER_CACHE: "weakref.WeakValueDictionary[str, ModelDispatcher]" = weakref.WeakValueDictionary()
+_DISPATCHER_CACHE_LOCK = threading.Lock()
+
+
+def settings_fingerprint(user_settings: Optional[Dict[str, Any]]) -> str:
+    """Returns a stable hash of a user's settings dict."""
+    payload = json.dumps(user_settings or {}, sort_keys=True, default=str).encode()
+    return hashlib.blake2b(payload, digest_size=16).hexdigest()
+
+
+def get_shared_dispatcher(user_settings: Optional[Dict[str, Any]],
+                          http_client: Optional[httpx.AsyncClient] = None) -> ModelDispatcher:
+    """Returns the ModelDispatcher for these settings, creating it on first use."""
+    signature = settings_fingerprint(user_settings)
+    with _DISPATCHER_CACHE_LOCK:
+        dispatcher = _DISPATCHER_CACHE.get(signature)
+        if dispatcher is None:
+            dispatcher = ModelDispatcher(user_settings=user_settings, http_client=http_client)
+            _DISPATCHER_CACHE[signature] = dispatcher
+        return dispatcher
@@ -55,6 +55,17 @@ class ReportSectionBase(BaseModel):
         description="Defines how the research/writing for this section should be approached."
     )
 
+# Schema drift guard: a field added to ReportSection must also be added to
+# ReportSectionBase (only the recursive 'subsections' is left out), otherwise the
+# LLM schema silently loses it. Checked once at import instead of in a test.
+_REPORT_SECTION_ONLY_FIELDS = set(ReportSection.model_fields) - set(ReportSectionBase.model_fields)
+if _REPORT_SECTION_ONLY_FIELDS != {'subsections'}:
+    raise TypeError(
+        f"Fields in ReportSectionBase have drifted from ReportSection. "
+        f"Difference: {_REPORT_SECTION_ONLY_FIELDS}. Expected difference: {{'subsections'}}. "
+        f"If you added a new field to ReportSection, please also add it to ReportSectionBase."
+    )
+
 class ReportSectionL2(ReportSectionBase):
     """Represents the deepest level of nesting (sub-subsections). No further nesting allowed."""
     pass
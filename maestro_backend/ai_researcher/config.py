@@ -385,6 +385,9 @@ RESEARCH_NOTE_CONTENT_LIMIT = get_research_note_content_limit() if DYNAMIC_CONFI
 EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", 8)) # Default 8: Batch size for embedding operations (reduced for memory safety)
 EMBEDDING_MAX_CONCURRENT_QUERIES = int(os.getenv("EMBEDDING_MAX_CONCURRENT_QUERIES", 3)) # Default 3: Max concurrent embedding queries
 EMBEDDING_MEMORY_MANAGEMENT = os.getenv("EMBEDDING_MEMORY_MANAGEMENT", "True").lower() == "true" # Enable GPU memory management
+EMBEDDING_OFFLOAD_INPUT_EMBEDDINGS = os.getenv("EMBEDDING_OFFLOAD_INPUT_EMBEDDINGS", "False").lower() == "true" # Keep the token embedding table memory-mapped on disk with an in-memory LRU of rows
+EMBEDDING_OFFLOAD_CACHE_FRACTION = float(os.getenv("EMBEDDING_OFFLOAD_CACHE_FRACTION", 0.1)) # Default 0.1: Fraction of vocabulary rows kept in memory when offloading
+EMBEDDER_QUANT = os.getenv("EMBEDDER_QUANT", "off").lower() # Default off: Weight quantization for the embedder and reranker (off, int8, fp8); check retrieval quality before enabling
 
 # --- Initial Exploration Phase ---
 CONSULT_RAG_FOR_INITIAL_QUESTIONS = os.getenv("CONSULT_RAG_FOR_INITIAL_QUESTIONS", "True").lower() == "false" # Whether to consult RAG DB for initial question generation
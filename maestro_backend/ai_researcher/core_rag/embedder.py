@@ -104,6 +104,18 @@ class TextEmbedder:
                 use_fp16=False
             )
             logger.debug("BGE-M3 model loaded successfully (forced fp32).")
+
+            # Optionally move the (large, Zipf-accessed) token embedding table to a memmap
+            if config.EMBEDDING_OFFLOAD_INPUT_EMBEDDINGS:
+                from ai_researcher.core_rag.offloaded_embedding import offload_input_embeddings
+                offload_input_embeddings(self.model, self.model_name, config.EMBEDDING_OFFLOAD_CACHE_FRACTION)
+                gc.collect()
+
+            # Optionally quantize the linear layers (int8/fp8)
+            if config.EMBEDDER_QUANT != "off":
+                from ai_researcher.core_rag.quantization import quantize_model
+                quantize_model(self.model, config.EMBEDDER_QUANT, self.model_name)
+                gc.collect()
             
             # Initial memory cleanup
             if self.enable_memory_management:
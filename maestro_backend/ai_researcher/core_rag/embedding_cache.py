@@ -0,0 +1,73 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Tuple
+
+import numpy as np
+
+
+def chunk_text_key(text: str) -> bytes:
+    """Cache key of a chunk: a 128-bit BLAKE2b digest of its text."""
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+
+
+class ChunkEmbeddingCache:
+    """
+    Bounded LRU of chunk embeddings keyed by a hash of the chunk text. Chunking
+    is deterministic, so reprocessing a document (or processing one that shares
+    sections with an earlier upload) yields chunks whose embeddings are already
+    known; only the misses are sent to the embedder.
+    """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[bytes, Tuple[np.ndarray, Dict[Any, float]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def embed_chunks(self, chunks: List[Dict[str, Any]],
+                     embed_fn: Callable[[List[Dict[str, Any]]], List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+        """
+        Adds an 'embeddings' dict to every chunk like TextEmbedder.embed_chunks,
+        calling `embed_fn` once for the chunk texts not seen before (each
+        distinct text is embedded only once). Returns `chunks`.
+        """
+        if self.max_entries <= 0:
+            return embed_fn(chunks)
+
+        pending: Dict[bytes, List[Dict[str, Any]]] = {}
+        with self._lock:
+            for chunk in chunks:
+                key = chunk_text_key(chunk["text"])
+                cached = self._entries.get(key)
+                if cached is None:
+                    pending.setdefault(key, []).append(chunk)
+                    continue
+                self._entries.move_to_end(key)
+                self.hits += 1
+                chunk["embeddings"] = {"dense": cached[0].copy(), "sparse": dict(cached[1])}
+
+        if not pending:
+            return chunks
+
+        # Embed one representative per distinct text, then share the result
+        representatives = [{**group[0]} for group in pending.values()]
+        embedded = embed_fn(representatives)
+        with self._lock:
+            self.misses += len(representatives)
+            for (key, group), result in zip(pending.items(), embedded):
+                dense = np.asarray(result["embeddings"]["dense"], dtype=np.float32)
+                sparse = result["embeddings"]["sparse"]
+                for chunk in group:
+                    chunk["embeddings"] = {"dense": dense.copy(), "sparse": dict(sparse)}
+                # The embedder pads failed batches with empty placeholders; never keep those
+                if sparse:
+                    self._entries[key] = (dense, dict(sparse))
+                    self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return chunks
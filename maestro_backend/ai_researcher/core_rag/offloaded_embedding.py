@@ -0,0 +1,137 @@
+import os
+import re
+import threading
+import logging
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+import torch
+import torch.nn as nn
+import torch.nn.functional as F
+
+logger = logging.getLogger(__name__)
+
+
+class OffloadedEmbedding(nn.Module):
+    """
+    Drop-in replacement for an inference-only nn.Embedding that keeps the full
+    weight matrix in a memory-mapped file and only a fixed number of rows in
+    memory. Token frequencies are heavily skewed, so a small LRU set of rows
+    serves almost every lookup; misses are read from the memmap on demand.
+    """
+
+    def __init__(self, weights_path: Path, num_embeddings: int, embedding_dim: int,
+                 cache_rows: int, dtype: torch.dtype, device: torch.device):
+        super().__init__()
+        self.num_embeddings = num_embeddings
+        self.embedding_dim = embedding_dim
+        self.cache_rows = max(1, min(cache_rows, num_embeddings))
+        self._np_dtype = torch.empty((), dtype=dtype).numpy().dtype
+        self._weights = np.memmap(weights_path, dtype=self._np_dtype, mode="r",
+                                  shape=(num_embeddings, embedding_dim))
+        self._lock = threading.Lock()
+        self._clock = 0
+
+        # Row storage plus the vocab-id <-> slot mapping and per-slot recency
+        self.register_buffer("cache", torch.zeros(self.cache_rows, embedding_dim, dtype=dtype, device=device), persistent=False)
+        self.register_buffer("slot_of", torch.full((num_embeddings,), -1, dtype=torch.long, device=device), persistent=False)
+        self.register_buffer("id_in_slot", torch.full((self.cache_rows,), -1, dtype=torch.long, device=device), persistent=False)
+        self.register_buffer("last_used", torch.zeros(self.cache_rows, dtype=torch.long, device=device), persistent=False)
+
+    @classmethod
+    def from_embedding(cls, embedding: nn.Embedding, weights_path: Path, cache_fraction: float) -> "OffloadedEmbedding":
+        """Writes the embedding weights to `weights_path` (once) and returns the offloaded module."""
+        weight = embedding.weight.detach()
+        num_embeddings, embedding_dim = weight.shape
+        np_dtype = torch.empty((), dtype=weight.dtype).numpy().dtype
+        expected_size = num_embeddings * embedding_dim * np_dtype.itemsize
+
+        if not weights_path.exists() or weights_path.stat().st_size != expected_size:
+            weights_path.parent.mkdir(parents=True, exist_ok=True)
+            # Per-process temp file: workers loading the same model may write concurrently
+            tmp_path = weights_path.with_suffix(f"{weights_path.suffix}.{os.getpid()}.tmp")
+            out = np.memmap(tmp_path, dtype=np_dtype, mode="w+", shape=(num_embeddings, embedding_dim))
+            out[:] = weight.cpu().numpy()
+            out.flush()
+            del out
+            os.replace(tmp_path, weights_path)
+            logger.info(f"Wrote embedding table ({num_embeddings}x{embedding_dim}) to {weights_path}")
+
+        cache_rows = int(num_embeddings * cache_fraction)
+        return cls(weights_path, num_embeddings, embedding_dim, cache_rows, weight.dtype, weight.device)
+
+    def _load_rows(self, ids: torch.Tensor) -> torch.Tensor:
+        rows = np.asarray(self._weights[ids.cpu().numpy()])
+        return torch.from_numpy(rows).to(device=self.cache.device, dtype=self.cache.dtype)
+
+    def forward(self, input_ids: torch.Tensor) -> torch.Tensor:
+        with self._lock:
+            unique_ids = torch.unique(input_ids)
+
+            # More distinct tokens than cache slots: serve this batch directly from the memmap
+            if unique_ids.numel() > self.cache_rows:
+                rows = self._load_rows(unique_ids)
+                return F.embedding(torch.searchsorted(unique_ids, input_ids), rows)
+
+            self._clock += 1
+            slots = self.slot_of[unique_ids]
+            missing = unique_ids[slots < 0]
+            if missing.numel() > 0:
+                # Evict the least recently used slots, never ones needed by this batch
+                self.last_used[slots[slots >= 0]] = self._clock
+                free_slots = torch.argsort(self.last_used)[: missing.numel()]
+                evicted = self.id_in_slot[free_slots]
+                self.slot_of[evicted[evicted >= 0]] = -1
+                self.cache[free_slots] = self._load_rows(missing)
+                self.id_in_slot[free_slots] = missing
+                self.slot_of[missing] = free_slots
+                slots = self.slot_of[unique_ids]
+
+            self.last_used[slots] = self._clock
+            return F.embedding(self.slot_of[input_ids], self.cache)
+
+
+def find_transformer_model(model_wrapper) -> Optional[nn.Module]:
+    """Returns the Hugging Face model nested inside a FlagEmbedding wrapper, or None."""
+    # FlagEmbedding nests the Hugging Face model at different depths across versions
+    candidate = model_wrapper
+    for _ in range(4):
+        if candidate is None:
+            break
+        if hasattr(candidate, "get_input_embeddings") and hasattr(candidate, "set_input_embeddings"):
+            return candidate
+        candidate = getattr(candidate, "model", None)
+    return None
+
+
+def offload_input_embeddings(model_wrapper, model_name: str, cache_fraction: float,
+                             cache_dir: Optional[Path] = None) -> bool:
+    """
+    Replaces the input embedding layer of the transformer inside `model_wrapper`
+    (e.g. a FlagEmbedding model) with an OffloadedEmbedding. Returns True on success.
+    """
+    hf_model = find_transformer_model(model_wrapper)
+    if hf_model is None:
+        logger.warning(f"Could not locate input embeddings for {model_name}; embedding offload skipped.")
+        return False
+
+    embedding = hf_model.get_input_embeddings()
+    if not isinstance(embedding, nn.Embedding):
+        logger.warning(f"Input embeddings of {model_name} are {type(embedding).__name__}; embedding offload skipped.")
+        return False
+
+    cache_dir = cache_dir or Path(os.getenv("EMBEDDING_OFFLOAD_DIR", Path.home() / ".cache" / "maestro" / "embeddings"))
+    safe_name = re.sub(r"[^A-Za-z0-9_.-]", "_", model_name)
+    # Keyed by shape and dtype too, so e.g. fp16 and fp32 loads of a model never share a file
+    num_embeddings, embedding_dim = embedding.weight.shape
+    dtype_name = str(embedding.weight.dtype).replace("torch.", "")
+    weights_path = Path(cache_dir) / f"{safe_name}.{num_embeddings}x{embedding_dim}.{dtype_name}.input_embeddings.bin"
+
+    offloaded = OffloadedEmbedding.from_embedding(embedding, weights_path, cache_fraction)
+    hf_model.set_input_embeddings(offloaded)
+    logger.info(
+        f"Offloaded input embeddings of {model_name}: keeping {offloaded.cache_rows} of "
+        f"{offloaded.num_embeddings} rows in memory."
+    )
+    return True
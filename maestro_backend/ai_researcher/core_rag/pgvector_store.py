@@ -11,11 +11,12 @@ Benefits over ChromaDB + PostgreSQL hybrid:
 """
 
 import numpy as np
-from typing import List, Dict, Any, Optional, Tuple
+from typing import List, Dict, Any, Optional, Tuple, Union
 import logging
 from sqlalchemy.orm import Session
 from sqlalchemy import text, select, and_
 import json
+import os
 
 # Import database components
 from database.database import get_db
@@ -26,6 +27,10 @@ logger = logging.getLogger(__name__)
 # Constants for embedding dimensions
 DENSE_DIMENSION = 1024  # BGE-M3 dense embeddings
 
+# pgvector type of document_chunks.dense_embedding; halfvec (pgvector 0.7+) stores
+# fp16 and halves row size and HNSW scan bandwidth. Set to "vector" for older pgvector.
+DENSE_VECTOR_TYPE = os.getenv("PGVECTOR_DENSE_TYPE", "halfvec")
+
 
 class PGVectorStore:
     """
@@ -62,7 +67,7 @@ class PGVectorStore:
         self,
         doc_id: str,
         chunks: List[Dict[str, Any]],
-        dense_embeddings: List[np.ndarray],
+        dense_embeddings: Union[np.ndarray, List[np.ndarray]],
         sparse_embeddings: List[Dict[int, float]],
         batch_size: int = 100
     ) -> Tuple[int, int]:
@@ -72,7 +77,7 @@ class PGVectorStore:
         Args:
             doc_id: Document ID
             chunks: List of chunk dictionaries with text and metadata
-            dense_embeddings: List of dense embedding vectors (1024-dim)
+            dense_embeddings: (n, 1024) float32 matrix, or a list of dense vectors
             sparse_embeddings: List of sparse embedding dictionaries
             batch_size: Number of chunks to insert in each batch
             
@@ -85,6 +90,8 @@ class PGVectorStore:
         
         chunks_added = 0
         total_chunks = len(chunks)
+        # One contiguous matrix; no copy when the caller already passes float32
+        dense_matrix = np.asarray(dense_embeddings, dtype=np.float32)
         
         db = next(get_db())
 
@@ -101,7 +108,7 @@ class PGVectorStore:
             for batch_start in range(0, total_chunks, batch_size):
                 batch_end = min(batch_start + batch_size, total_chunks)
                 batch_chunks = chunks[batch_start:batch_end]
-                batch_dense = dense_embeddings[batch_start:batch_end]
+                batch_dense = dense_matrix[batch_start:batch_end]
                 batch_sparse = sparse_embeddings[batch_start:batch_end]
                 
                 for i, chunk in enumerate(batch_chunks):
@@ -116,11 +123,8 @@ class PGVectorStore:
                         chunk_text = str(chunk)
                         chunk_metadata = {}
                     
-                    # Prepare dense embedding
-                    dense_embedding = batch_dense[i]
-                    if isinstance(dense_embedding, np.ndarray):
-                        # Convert to list for PostgreSQL
-                        dense_embedding = dense_embedding.tolist()
+                    # Prepare dense embedding (list for PostgreSQL)
+                    dense_embedding = batch_dense[i].tolist()
                     
                     # Prepare sparse embedding
                     sparse_dict = batch_sparse[i]
@@ -139,11 +143,11 @@ class PGVectorStore:
                         logger.debug(f"Updated existing chunk {chunk_id}")
                     else:
                         # Insert using raw SQL for pgvector support
-                        insert_query = text("""
+                        insert_query = text(f"""
                             INSERT INTO document_chunks 
                             (doc_id, chunk_id, chunk_index, chunk_text, dense_embedding, sparse_embedding, chunk_metadata)
                             VALUES 
-                            (:doc_id, :chunk_id, :chunk_index, :chunk_text, CAST(:dense_embedding AS vector), CAST(:sparse_embedding AS jsonb), CAST(:chunk_metadata AS jsonb))
+                            (:doc_id, :chunk_id, :chunk_index, :chunk_text, CAST(:dense_embedding AS {DENSE_VECTOR_TYPE}), CAST(:sparse_embedding AS jsonb), CAST(:chunk_metadata AS jsonb))
                         """)
                         
                         db.execute(insert_query, {
@@ -237,10 +241,10 @@ class PGVectorStore:
                         doc_id,
                         chunk_text,
                         chunk_metadata,
-                        1 - (dense_embedding <=> CAST(:query_embedding AS vector)) as dense_similarity
+                        1 - (dense_embedding <=> CAST(:query_embedding AS {DENSE_VECTOR_TYPE})) as dense_similarity
                     FROM document_chunks
                     WHERE dense_embedding IS NOT NULL {where_clause}
-                    ORDER BY dense_embedding <=> CAST(:query_embedding AS vector)
+                    ORDER BY dense_embedding <=> CAST(:query_embedding AS {DENSE_VECTOR_TYPE})
                     LIMIT :limit
                 )
                 SELECT 
@@ -0,0 +1,76 @@
+import logging
+
+import torch
+import torch.nn as nn
+
+from ai_researcher.core_rag.offloaded_embedding import find_transformer_model
+
+logger = logging.getLogger(__name__)
+
+QUANT_MODES = ("off", "int8", "fp8")
+
+
+def _replace_linear_with_int8(module: nn.Module, threshold: float = 6.0) -> int:
+    """Swaps every nn.Linear below `module` for a bitsandbytes Linear8bitLt. Returns the number replaced."""
+    import bitsandbytes as bnb
+
+    replaced = 0
+    for name, child in module.named_children():
+        if isinstance(child, nn.Linear):
+            device = child.weight.device
+            int8_linear = bnb.nn.Linear8bitLt(
+                child.in_features, child.out_features, bias=child.bias is not None,
+                has_fp16_weights=False, threshold=threshold,
+            )
+            int8_linear.weight = bnb.nn.Int8Params(
+                child.weight.data.to("cpu", torch.float16), requires_grad=False, has_fp16_weights=False
+            )
+            if child.bias is not None:
+                int8_linear.bias = nn.Parameter(child.bias.data.to(torch.float16), requires_grad=False)
+            # Moving Int8Params to the GPU performs the actual quantization
+            setattr(module, name, int8_linear.to(device))
+            replaced += 1
+        else:
+            replaced += _replace_linear_with_int8(child, threshold)
+    return replaced
+
+
+def quantize_model(model_wrapper, mode: str, model_name: str) -> bool:
+    """
+    Quantizes the linear layers of the transformer inside `model_wrapper`
+    (a FlagEmbedding model or reranker) in place. Returns True on success.
+
+    int8: dynamic int8 quantization on CPU, bitsandbytes Linear8bitLt on GPU.
+    fp8:  float8 weight-only quantization via torchao (Ada/Hopper GPUs).
+    """
+    mode = (mode or "off").lower()
+    if mode == "off":
+        return False
+    if mode not in QUANT_MODES:
+        logger.warning(f"Unknown quantization mode '{mode}' for {model_name}; expected one of {QUANT_MODES}.")
+        return False
+
+    hf_model = find_transformer_model(model_wrapper)
+    if hf_model is None:
+        logger.warning(f"Could not locate the transformer inside {model_name}; quantization skipped.")
+        return False
+
+    device = next(hf_model.parameters()).device
+    try:
+        if mode == "int8" and device.type == "cpu":
+            torch.ao.quantization.quantize_dynamic(hf_model, {nn.Linear}, dtype=torch.qint8, inplace=True)
+        elif mode == "int8":
+            replaced = _replace_linear_with_int8(hf_model)
+            logger.debug(f"Replaced {replaced} linear layers of {model_name} with Linear8bitLt")
+        else:
+            from torchao.quantization import quantize_, float8_weight_only
+            quantize_(hf_model, float8_weight_only())
+    except ImportError as e:
+        logger.warning(f"{mode} quantization of {model_name} needs an optional package that is not installed: {e}")
+        return False
+    except Exception as e:
+        logger.warning(f"{mode} quantization of {model_name} failed on {device}, using full precision: {e}")
+        return False
+
+    logger.info(f"Quantized {model_name} weights to {mode} on {device}")
+    return True
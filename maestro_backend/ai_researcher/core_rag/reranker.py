@@ -1,5 +1,7 @@
 import os
+import hashlib
 import threading # Import the threading module
+from collections import OrderedDict
 from typing import List, Dict, Any, Optional, Tuple
 import torch
 from FlagEmbedding import FlagReranker
@@ -8,6 +10,9 @@ import sys
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from hardware_detection import hardware_detector
 
+# Number of (query, document) scores kept in the reranker's LRU cache
+RERANKER_SCORE_CACHE_SIZE = int(os.getenv("RERANKER_SCORE_CACHE_SIZE", "8192"))
+
 class TextReranker:
     """
     Reranks search results using a cross-encoder model (e.g., BGE-Reranker).
@@ -50,6 +55,11 @@ class TextReranker:
             # Initialize the FlagReranker model
             self.model = FlagReranker(self.model_name, use_fp16=use_fp16)
             print(f"Reranker model loaded successfully (FP16: {use_fp16})")
+
+            # Optionally quantize the linear layers (int8/fp8)
+            if config.EMBEDDER_QUANT != "off":
+                from ai_researcher.core_rag.quantization import quantize_model
+                quantize_model(self.model, config.EMBEDDER_QUANT, self.model_name)
             
             # Set CPU optimizations if needed
             if device_info["device_type"] == "cpu":
@@ -64,6 +74,19 @@ class TextReranker:
         # Add a lock for thread safety
         self._lock = threading.Lock()
 
+        # LRU cache of computed scores keyed by a hash of (model, query, document).
+        # Research loops rerank the same documents against the same queries
+        # repeatedly; cached pairs skip the cross-encoder entirely.
+        self._score_cache: "OrderedDict[bytes, float]" = OrderedDict()
+        self._score_cache_size = RERANKER_SCORE_CACHE_SIZE
+
+    def _pair_key(self, query: str, document_text: str) -> bytes:
+        h = hashlib.blake2b(digest_size=16)
+        for part in (self.model_name, query, document_text):
+            h.update(str(part).encode("utf-8", "surrogatepass"))
+            h.update(b"\x00")
+        return h.digest()
+
     def rerank(self, query: str, results: List[Any], top_n: Optional[int] = None) -> List[Tuple[float, Any]]:
         """
         Reranks a list of retrieved documents based on their relevance to the query.
@@ -106,14 +129,26 @@ class TextReranker:
                 document_text = str(result)
             pairs.append([query, document_text])
 
-        all_scores = []
+        # Look up cached scores first; only uncached pairs go through the model
+        pair_keys = [self._pair_key(q, d) for q, d in pairs]
+        cached_scores: Dict[int, float] = {}
+        with self._lock:
+            for idx, key in enumerate(pair_keys):
+                score = self._score_cache.get(key)
+                if score is not None:
+                    self._score_cache.move_to_end(key)
+                    cached_scores[idx] = score
+        miss_indices = [idx for idx in range(len(pairs)) if idx not in cached_scores]
+        miss_pairs = [pairs[idx] for idx in miss_indices]
+
+        computed_scores = []
         try:
             # Acquire the lock before accessing the shared model
             with self._lock:
                 # Compute scores in batches
                 with torch.no_grad(): # Ensure no gradients are computed
-                     for i in tqdm(range(0, len(pairs), self.batch_size), desc="Reranking"):
-                          batch_pairs = pairs[i : i + self.batch_size]
+                     for i in tqdm(range(0, len(miss_pairs), self.batch_size), desc="Reranking", disable=not miss_pairs):
+                          batch_pairs = miss_pairs[i : i + self.batch_size]
                           # Compute scores for the batch
                           # This part is now protected by the lock
                           scores = self.model.compute_score(batch_pairs, normalize=True) # Normalize scores (optional, often 0-1)
@@ -136,7 +171,14 @@ class TextReranker:
                                          # Skip extending for this batch if type is unknown
                                          continue # This is now correctly inside the loop
 
-                          all_scores.extend(processed_scores)
+                          computed_scores.extend(processed_scores)
+
+                # Store newly computed scores, evicting the least recently used
+                if len(computed_scores) == len(miss_indices):
+                     for idx, score in zip(miss_indices, computed_scores):
+                          self._score_cache[pair_keys[idx]] = score
+                     while len(self._score_cache) > self._score_cache_size:
+                          self._score_cache.popitem(last=False)
 
         except Exception as e:
              print(f"Error during reranking computation: {e}")
@@ -144,9 +186,11 @@ class TextReranker:
              return [(0.0, result) for result in results]
 
         # Check if scores length matches results length
-        if len(all_scores) != len(results):
-             print(f"Warning: Mismatch between number of results ({len(results)}) and computed reranker scores ({len(all_scores)}). Returning original results with default scores.")
+        if len(computed_scores) != len(miss_indices):
+             print(f"Warning: Mismatch between number of results ({len(results)}) and computed reranker scores ({len(cached_scores) + len(computed_scores)}). Returning original results with default scores.")
              return [(0.0, result) for result in results]
+        cached_scores.update(zip(miss_indices, computed_scores))
+        all_scores = [cached_scores[idx] for idx in range(len(results))]
 
 
         # Create a list of (score, result) tuples
@@ -286,8 +286,9 @@ class HardwareDetector:
         cpu_count = multiprocessing.cpu_count()
         
         if device_type == "cpu":
-            # Use most CPUs for processing
-            return max(1, cpu_count - 2)
+            # Use most CPUs for processing, shared between uvicorn worker processes
+            web_concurrency = max(1, int(os.getenv("WEB_CONCURRENCY", "1")))
+            return max(1, (cpu_count - 2) // web_concurrency)
         else:
             # GPU processing, use fewer workers
             return min(4, cpu_count // 2)
@@ -1,11 +1,20 @@
+import threading
+from collections import OrderedDict
+
 from fastapi import Request, Depends
 from ai_researcher.agentic_layer.tool_registry import ToolRegistry
 from ai_researcher.core_rag.embedder import TextEmbedder
 from ai_researcher.core_rag.reranker import TextReranker
 from ai_researcher.agentic_layer.controller.writing_controller import WritingController
+from ai_researcher.agentic_layer.model_dispatcher import settings_fingerprint
 from auth.dependencies import get_current_user_from_cookie
 from database.models import User
 
+# Upper bound on the number of WritingControllers (one per distinct settings) kept in app.state
+WRITING_CONTROLLER_CACHE_SIZE = 1000
+
+_writing_controllers_lock = threading.Lock()
+
 def get_tool_registry(request: Request) -> ToolRegistry:
     """Get the singleton ToolRegistry instance from the app state."""
     return request.app.state.tool_registry
@@ -24,9 +33,35 @@ def get_writing_controller(
     text_embedder: TextEmbedder = Depends(get_text_embedder),
     text_reranker: TextReranker = Depends(get_text_reranker),
 ) -> WritingController:
-    """Get a user-specific WritingController instance."""
-    return WritingController(
-        user=current_user,
-        text_embedder=text_embedder,
-        text_reranker=text_reranker,
-    )
+    """
+    Get the WritingController for the current user's settings.
+
+    Controllers hold no per-user state beyond the settings-specific
+    ModelDispatcher, so they are cached in app.state by settings fingerprint
+    and shared by every request (and user) with the same settings; nothing on
+    a cached controller is modified per request.
+    """
+    state = request.app.state
+    signature = settings_fingerprint(current_user.settings)
+
+    with _writing_controllers_lock:
+        cache = getattr(state, "writing_controllers", None)
+        if cache is None:
+            cache = state.writing_controllers = OrderedDict()
+
+        controller = cache.get(signature)
+        if controller is not None:
+            cache.move_to_end(signature)
+            return controller
+
+        controller = WritingController(
+            user=current_user,
+            text_embedder=text_embedder,
+            text_reranker=text_reranker,
+            # This dependency runs outside the event loop, so hand over the app's client
+            http_client=getattr(state, "llm_http_client", None),
+        )
+        cache[signature] = controller
+        while len(cache) > WRITING_CONTROLLER_CACHE_SIZE:
+            cache.popitem(last=False)
+        return controller
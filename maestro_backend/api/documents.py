@@ -1,4 +1,7 @@
+import hashlib
+import os
 import uuid
+import aiofiles
 from datetime import datetime
 from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Query
 from fastapi.responses import JSONResponse
@@ -17,6 +20,34 @@ import logging
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
+# Bytes read from an upload per step while it is hashed and written to disk
+UPLOAD_CHUNK_SIZE = 1 << 20
+
+
+async def _save_upload(file: UploadFile, file_path: str) -> tuple:
+    """
+    Streams an upload to disk, hashing it on the way, so large files are never
+    held in memory whole. Returns the SHA-256 hex digest and the size in bytes.
+    """
+    hasher = hashlib.sha256()
+    size = 0
+    async with aiofiles.open(file_path, "wb") as f:
+        while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+            hasher.update(chunk)
+            await f.write(chunk)
+            size += len(chunk)
+    return hasher.hexdigest(), size
+
+
+def _discard_upload(file_path: Optional[str]) -> None:
+    """Removes a saved upload that no document row references."""
+    if not file_path or not os.path.exists(file_path):
+        return
+    try:
+        os.remove(file_path)
+    except OSError as e:
+        logger.warning(f"Could not remove orphaned upload {file_path}: {e}")
+
 # Documents Endpoints
 
 # Get all documents endpoint - must come before {doc_id} route
@@ -156,20 +187,19 @@ async def upload_document(
             detail="Only PDF, Word (docx, doc), and Markdown (md, markdown) files are supported"
         )
     
+    # Set while the saved file is not yet owned by a committed document row
+    orphan_path = None
     try:
-        import uuid
-        import os
-        import hashlib
-        from datetime import datetime
-        
-        # Read file content
-        file_content = await file.read()
-        
         # Generate document ID
         doc_id = str(uuid.uuid4())
         
-        # Calculate file hash for deduplication
-        file_hash = hashlib.sha256(file_content).hexdigest()
+        # Save the file to disk, calculating its hash for deduplication
+        upload_dir = "/app/data/raw_files"
+        os.makedirs(upload_dir, exist_ok=True)
+        
+        file_path = os.path.join(upload_dir, f"{doc_id}_{file.filename}")
+        orphan_path = file_path
+        file_hash, file_size = await _save_upload(file, file_path)
         logger.info(f"Calculated file hash for {file.filename}: {file_hash}")
         
         # Check if document already exists (by hash)
@@ -180,6 +210,8 @@ async def upload_document(
         
         if existing:
             logger.info(f"Found existing document with same hash: {existing.id} - {existing.filename}")
+            os.remove(file_path)
+            orphan_path = None
         
         if existing:
             # Document already exists, return with 409 Conflict status
@@ -196,14 +228,6 @@ async def upload_document(
                 }
             )
         
-        # Save the file to disk
-        upload_dir = "/app/data/raw_files"
-        os.makedirs(upload_dir, exist_ok=True)
-        
-        file_path = os.path.join(upload_dir, f"{doc_id}_{file.filename}")
-        with open(file_path, "wb") as f:
-            f.write(file_content)
-        
         # Create document record in database
         metadata = {
             "title": file.filename,
@@ -220,7 +244,7 @@ async def upload_document(
             original_filename=file.filename,
             metadata_=metadata,
             processing_status="pending",
-            file_size=len(file_content),
+            file_size=file_size,
             file_path=file_path,
             raw_file_path=file_path,
             created_at=datetime.utcnow(),
@@ -229,6 +253,7 @@ async def upload_document(
         
         db.add(new_document)
         db.commit()
+        orphan_path = None
         db.refresh(new_document)
         
         # Trigger document processing (send to background processor)
@@ -256,6 +281,9 @@ async def upload_document(
     except Exception as e:
         logger.error(f"Error uploading document: {e}")
         raise HTTPException(status_code=500, detail=f"Failed to upload document: {str(e)}")
+    finally:
+        # Also covers cancellation when the client disconnects mid-upload
+        _discard_upload(orphan_path)
 
 # New endpoint to upload and process documents to a specific group
 @router.post("/document-groups/{group_id}/upload/")
@@ -278,20 +306,19 @@ async def upload_document_to_group(
             detail="Only PDF, Word (docx, doc), and Markdown (md, markdown) files are supported"
         )
     
+    # Set while the saved file is not yet owned by a committed document row
+    orphan_path = None
     try:
-        import uuid
-        import os
-        import hashlib
-        from datetime import datetime
-        
-        # Read file content
-        file_content = await file.read()
-        
         # Generate document ID
         doc_id = str(uuid.uuid4())
         
-        # Calculate file hash for deduplication
-        file_hash = hashlib.sha256(file_content).hexdigest()
+        # Save the file to disk, calculating its hash for deduplication
+        upload_dir = "/app/data/raw_files"
+        os.makedirs(upload_dir, exist_ok=True)
+        
+        file_path = os.path.join(upload_dir, f"{doc_id}_{file.filename}")
+        orphan_path = file_path
+        file_hash, file_size = await _save_upload(file, file_path)
         logger.info(f"Calculated file hash for {file.filename}: {file_hash}")
         
         # Check if document already exists (by hash)
@@ -302,6 +329,8 @@ async def upload_document_to_group(
         
         if existing:
             logger.info(f"Found existing document with same hash: {existing.id} - {existing.filename}")
+            os.remove(file_path)
+            orphan_path = None
         
         if existing:
             # Document already exists, just add to group if not already there
@@ -344,14 +373,6 @@ async def upload_document_to_group(
                     }
                 )
         
-        # Save the file to disk
-        upload_dir = "/app/data/raw_files"
-        os.makedirs(upload_dir, exist_ok=True)
-        
-        file_path = os.path.join(upload_dir, f"{doc_id}_{file.filename}")
-        with open(file_path, "wb") as f:
-            f.write(file_content)
-        
         # Create document record in database
         metadata = {
             "title": file.filename,
@@ -368,7 +389,7 @@ async def upload_document_to_group(
             original_filename=file.filename,
             metadata_=metadata,
             processing_status="pending",
-            file_size=len(file_content),
+            file_size=file_size,
             file_path=file_path,
             raw_file_path=file_path,
             created_at=datetime.utcnow(),
@@ -377,6 +398,7 @@ async def upload_document_to_group(
         
         db.add(new_document)
         db.commit()
+        orphan_path = None
         db.refresh(new_document)
         
         # Add document to group
@@ -407,6 +429,9 @@ async def upload_document_to_group(
     except Exception as e:
         logger.error(f"Error uploading document: {e}")
         raise HTTPException(status_code=500, detail=f"Failed to upload document: {str(e)}")
+    finally:
+        # Also covers cancellation when the client disconnects mid-upload
+        _discard_upload(orphan_path)
 
 # New endpoint to get documents in a group (integrates with existing vector store)
 @router.get("/document-groups/{group_id}/documents/", response_model=schemas.PaginatedDocumentResponse)
@@ -1188,22 +1213,3 @@ async def cancel_document_processing(
     except Exception as e:
         logger.debug(f"Error cancelling document processing: {e}")
         raise HTTPException(status_code=500, detail="Failed to cancel document processing")
-
-# Note: The following endpoint is for internal use by the doc-processor service
-@router.post("/internal/document-progress", status_code=202, include_in_schema=False)
-async def post_document_progress(update: schemas.DocumentProgressUpdate):
-    """
-    Internal endpoint for the document processor to post progress updates.
-    These updates are then broadcast to the relevant user via WebSockets.
-    """
-    try:
-        logger.debug(f"Received progress update: {update.dict()}")
-        await send_document_update(str(update.user_id), update.dict())
-        logger.debug(f"Successfully sent document update to user {update.user_id}")
-        return {"status": "update accepted"}
-    except Exception as e:
-        # Log the error but don't crash the service
-        logger.debug(f"Error broadcasting document update: {e}")
-        import traceback
-        traceback.print_exc()
-        return {"status": "update failed"}
@@ -27,7 +27,7 @@ from ai_researcher.agentic_layer.agent_controller import AgentController
 from ai_researcher import config
 from ai_researcher.agentic_layer.controller.core_controller import MaybeSemaphore
 import json
-from ai_researcher.agentic_layer.model_dispatcher import ModelDispatcher
+from ai_researcher.agentic_layer.model_dispatcher import ModelDispatcher, close_llm_http_client
 from ai_researcher.agentic_layer.tool_registry import ToolRegistry
 from ai_researcher.core_rag.retriever import Retriever
 from ai_researcher.core_rag.reranker import TextReranker
@@ -290,6 +290,13 @@ async def transform_note_for_frontend(note) -> dict:
     
     return transformed
 
+async def _run_on_own_loop(coro):
+    """Awaits a mission coroutine in its thread's loop, then closes that loop's LLM HTTP client."""
+    try:
+        return await coro
+    finally:
+        await close_llm_http_client()
+
 # Global instances - these will be initialized when the app starts
 context_manager: Optional[ContextManager] = None
 agent_controller: Optional[AgentController] = None
@@ -891,11 +898,11 @@ async def resume_mission_execution(
         def run_mission_in_thread():
             """Sets user context and resumes the mission from where it left off."""
             set_current_user(current_user)
-            asyncio.run(controller.resume_mission(
+            asyncio.run(_run_on_own_loop(controller.resume_mission(
                 mission_id,
                 log_queue=log_queue,
                 update_callback=websocket_update_callback
-            ))
+            )))
 
         loop.run_in_executor(thread_pool, run_mission_in_thread)
         
@@ -1114,11 +1121,11 @@ async def start_mission_execution(
         def run_mission_in_thread():
             """Sets user context and runs the mission."""
             set_current_user(current_user)
-            asyncio.run(controller.run_mission(
+            asyncio.run(_run_on_own_loop(controller.run_mission(
                 mission_id,
                 log_queue=log_queue,
                 update_callback=websocket_update_callback
-            ))
+            )))
 
         loop.run_in_executor(thread_pool, run_mission_in_thread)
         
@@ -397,14 +397,6 @@ class DocumentGroupWithCount(DocumentGroupBase):
             datetime: lambda v: v.isoformat()
         }
 
-class DocumentProgressUpdate(BaseModel):
-    user_id: int
-    doc_id: str
-    progress: int
-    status: str
-    error: Optional[str] = None
-    timestamp: str
-
 class DocumentMetadataUpdate(BaseModel):
     title: Optional[str] = None
     authors: Optional[List[str]] = None
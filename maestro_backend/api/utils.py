@@ -7,8 +7,23 @@ import logging
 from pathlib import Path
 from typing import Any, Dict, List, Optional
 
+import orjson
+from fastapi.responses import ORJSONResponse
+
 logger = logging.getLogger(__name__)
 
+class FastJSONResponse(ORJSONResponse):
+    """
+    Default response class for the API. Serializes with orjson, which handles
+    datetime/UUID natively and is several times faster than the stdlib encoder.
+    Non-string dict keys are allowed to match json.dumps behaviour.
+    """
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(
+            content,
+            option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+        )
+
 def _make_serializable(data: Any) -> Any:
     """Recursively converts non-JSON-serializable types in dicts/lists to strings."""
     if isinstance(data, dict):
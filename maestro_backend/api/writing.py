@@ -928,6 +928,7 @@ async def process_writing_chat_in_background(
             user=current_user,
             text_embedder=text_embedder,
             text_reranker=text_reranker,
+            http_client=getattr(app.state, "llm_http_client", None),
         )
         agent = SimplifiedWritingAgent(
             model_dispatcher=writing_controller.model_dispatcher,
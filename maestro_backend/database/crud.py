@@ -1,5 +1,6 @@
 from sqlalchemy.orm import Session, joinedload
 from sqlalchemy import and_, or_, text
+from database.database import retry_on_disconnect
 from database.models import User, Chat, Message, Mission, Document, DocumentGroup, WritingSessionStats, SystemSetting, MissionExecutionLog
 from api import schemas
 from auth.security import get_password_hash
@@ -16,16 +17,20 @@ def get_current_time() -> datetime:
     return datetime.now(SERVER_TIMEZONE)
 
 # User CRUD operations
+@retry_on_disconnect
 def get_user(db: Session, user_id: int):
     return db.query(User).filter(User.id == user_id).first()
 
+@retry_on_disconnect
 def get_user_by_username(db: Session, username: str):
     return db.query(User).filter(User.username == username).first()
 
+@retry_on_disconnect
 def get_user_by_email(db: Session, email: str):
     # Assuming username is the email for now
     return db.query(User).filter(User.username == email).first()
 
+@retry_on_disconnect
 def get_users(db: Session, skip: int = 0, limit: int = 100):
     return db.query(User).offset(skip).limit(limit).all()
 
@@ -123,18 +128,21 @@ def create_chat(db: Session, chat_id: str, user_id: int, title: str, document_gr
     db.refresh(db_chat)
     return db_chat
 
+@retry_on_disconnect
 def get_chat(db: Session, chat_id: str, user_id: int) -> Optional[Chat]:
     """Get a chat by ID, ensuring it belongs to the user."""
     return db.query(Chat).filter(
         and_(Chat.id == chat_id, Chat.user_id == user_id)
     ).first()
 
+@retry_on_disconnect
 def get_user_chats(db: Session, user_id: int, skip: int = 0, limit: int = 100) -> List[Chat]:
     """Get all chats for a user, ordered by most recent."""
     return db.query(Chat).filter(Chat.user_id == user_id).order_by(
         Chat.updated_at.desc()
     ).offset(skip).limit(limit).all()
 
+@retry_on_disconnect
 def get_user_chats_by_type(db: Session, user_id: int, chat_type: str, skip: int = 0, limit: int = 100) -> List[Chat]:
     """Get chats for a user filtered by chat type, ordered by most recent."""
     return db.query(Chat).filter(
@@ -222,6 +230,7 @@ def create_message(db: Session, message_id: str, chat_id: str, content: str, rol
     db.refresh(db_message)
     return db_message
 
+@retry_on_disconnect
 def get_chat_messages(db: Session, chat_id: str, user_id: int, skip: int = 0, limit: int = 100) -> List[Message]:
     """Get messages for a chat, ensuring the chat belongs to the user."""
     # First verify the chat belongs to the user
@@ -374,6 +383,7 @@ def create_mission(db: Session, mission_id: str, chat_id: str, user_request: str
     db.refresh(db_mission)
     return db_mission
 
+@retry_on_disconnect
 def get_mission(db: Session, mission_id: str, user_id: int) -> Optional[Mission]:
     """Get a mission by ID, ensuring it belongs to the user through the chat."""
     return db.query(Mission).join(Chat).filter(
@@ -483,12 +493,14 @@ def create_document(db: Session, doc_id: str, user_id: int, original_filename: s
     db.refresh(db_document)
     return db_document
 
+@retry_on_disconnect
 def get_document(db: Session, doc_id: str, user_id: int) -> Optional[Document]:
     """Get a document by ID, ensuring it belongs to the user."""
     return db.query(Document).filter(
         and_(Document.id == doc_id, Document.user_id == user_id)
     ).first()
 
+@retry_on_disconnect
 def get_user_documents(db: Session, user_id: int, skip: int = 0, limit: int = 100) -> List[Document]:
     """Get all documents for a user."""
     return db.query(Document).filter(Document.user_id == user_id).order_by(
@@ -568,6 +580,7 @@ def create_document_group(db: Session, group_id: str, user_id: int, name: str, d
     db.refresh(db_group)
     return db_group
 
+@retry_on_disconnect
 def get_document_group(db: Session, group_id: str, user_id: int) -> Optional[DocumentGroup]:
     """Get a document group by ID, ensuring it belongs to the user."""
     # IMPORTANT: Do NOT use joinedload here as it causes segfaults when the relationship is modified
@@ -576,6 +589,7 @@ def get_document_group(db: Session, group_id: str, user_id: int) -> Optional[Doc
         and_(DocumentGroup.id == group_id, DocumentGroup.user_id == user_id)
     ).first()
 
+@retry_on_disconnect
 def get_user_document_groups(db: Session, user_id: int, skip: int = 0, limit: int = 100) -> List[DocumentGroup]:
     """Get all document groups for a user."""
     return db.query(DocumentGroup).filter(DocumentGroup.user_id == user_id).order_by(
@@ -658,10 +672,14 @@ def remove_document_from_group(db: Session, group_id: str, doc_id: str, user_id:
     return db_group
 
 def get_next_queued_document(db: Session) -> Optional[Document]:
-    """Get the next document with 'pending' or 'queued' status."""
+    """
+    Get the next document with 'pending' or 'queued' status. The row stays
+    locked until the caller commits, and rows locked by other workers are
+    skipped, so concurrent workers never claim the same document.
+    """
     return db.query(Document).filter(
         or_(Document.processing_status == 'pending', Document.processing_status == 'queued')
-    ).order_by(Document.created_at).first()
+    ).order_by(Document.created_at).with_for_update(skip_locked=True).first()
 
 def update_document_status(db: Session, doc_id: str, user_id: int, status: str, 
                           progress: Optional[int] = None, error: Optional[str] = None,
@@ -907,6 +925,7 @@ def update_user_password(db: Session, user_id: int, new_password: str):
     return db_user
 
 # System Settings CRUD
+@retry_on_disconnect
 def get_system_setting(db: Session, key: str) -> Optional[SystemSetting]:
     """Retrieve a system setting by its key."""
     return db.query(SystemSetting).filter(SystemSetting.key == key).first()
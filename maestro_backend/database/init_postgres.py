@@ -63,6 +63,80 @@ def ensure_extensions():
         logger.error(f"Failed to ensure extensions: {str(e)}")
         raise
 
+# Current type of document_chunks.dense_embedding, e.g. 'vector(1024)'
+DENSE_EMBEDDING_TYPE_SQL = text("""
+SELECT format_type(atttypid, atttypmod)
+FROM pg_attribute
+WHERE attrelid = to_regclass('document_chunks') AND attname = 'dense_embedding'
+""")
+
+def _dense_embedding_types():
+    """Returns (current, configured) type of document_chunks.dense_embedding; current is None without the table"""
+    from ai_researcher.core_rag.pgvector_store import DENSE_DIMENSION, DENSE_VECTOR_TYPE
+
+    with engine.connect() as conn:
+        current_type = conn.execute(DENSE_EMBEDDING_TYPE_SQL).scalar()
+    return current_type, f"{DENSE_VECTOR_TYPE}({DENSE_DIMENSION})"
+
+def check_dense_embedding_type():
+    """
+    Read-only startup check: raise if document_chunks.dense_embedding does not
+    have the configured type, since every chunk insert and search casts to it.
+    The conversion itself is a migration step, see ensure_dense_embedding_type.
+    """
+    current_type, target_type = _dense_embedding_types()
+    if current_type is None or current_type == target_type:
+        return
+    message = (
+        f"document_chunks.dense_embedding is {current_type} but PGVECTOR_DENSE_TYPE expects {target_type}. "
+        f"Run 'python -m database.init_postgres --migrate-dense-embeddings' (start.sh does this before "
+        f"starting the server) or set PGVECTOR_DENSE_TYPE to match the column."
+    )
+    logger.error(message)
+    raise RuntimeError(message)
+
+def ensure_dense_embedding_type():
+    """
+    Convert document_chunks.dense_embedding to the configured pgvector type (halfvec by default).
+    Rewrites the table under an ACCESS EXCLUSIVE lock, so it runs as an explicit
+    migration step before the server starts, never during API startup. Raises on failure.
+    """
+    from ai_researcher.core_rag.pgvector_store import DENSE_VECTOR_TYPE
+
+    current_type, target_type = _dense_embedding_types()
+    if current_type is None or current_type == target_type:
+        logger.info(f"Dense embedding column type: {current_type or 'no table yet'}")
+        return
+
+    logger.info(f"Converting dense embeddings from {current_type} to {target_type}; document_chunks is locked until this finishes...")
+    try:
+        with engine.begin() as conn:
+            # Rewriting the table and rebuilding the index can exceed the default timeout
+            conn.execute(text("SET LOCAL statement_timeout = 0"))
+            conn.execute(text("DROP INDEX IF EXISTS idx_dense_embedding_hnsw"))
+            conn.execute(text(
+                f"ALTER TABLE document_chunks ALTER COLUMN dense_embedding "
+                f"TYPE {target_type} USING dense_embedding::{target_type}"
+            ))
+            conn.execute(text(
+                f"CREATE INDEX idx_dense_embedding_hnsw ON document_chunks "
+                f"USING hnsw (dense_embedding {DENSE_VECTOR_TYPE}_cosine_ops) "
+                f"WITH (m = 16, ef_construction = 64)"
+            ))
+    except Exception as e:
+        logger.error(f"Failed to convert dense embeddings to {target_type}: {str(e)}")
+        raise
+    logger.info(f"Dense embeddings converted to {target_type}")
+
+def migrate_dense_embeddings():
+    """Entry point of the explicit dense embedding migration step"""
+    if DATABASE_URL.startswith("sqlite"):
+        logger.info("Using SQLite database, no dense embedding migration needed")
+        return
+    if not wait_for_database():
+        sys.exit(1)
+    ensure_dense_embedding_type()
+
 def create_tables():
     """Create all database tables"""
     try:
@@ -196,4 +270,7 @@ def main():
         sys.exit(1)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    if "--migrate-dense-embeddings" in sys.argv[1:]:
+        migrate_dense_embeddings()
+    else:
+        main()
\ No newline at end of file
@@ -13,7 +13,7 @@ CREATE TABLE document_chunks (
     chunk_text TEXT NOT NULL,  -- Store the actual text content
     
     -- Vector embeddings using pgvector
-    dense_embedding vector(1024),  -- BGE-M3 dense embeddings
+    dense_embedding halfvec(1024),  -- BGE-M3 dense embeddings, stored as fp16
     sparse_embedding JSONB NOT NULL,  -- Sparse embeddings as JSONB (only non-zero values)
     
     -- Metadata
@@ -31,7 +31,7 @@ CREATE TABLE document_chunks (
 -- HNSW is faster than IVFFlat for most use cases
 CREATE INDEX IF NOT EXISTS idx_dense_embedding_hnsw 
     ON document_chunks 
-    USING hnsw (dense_embedding vector_cosine_ops)
+    USING hnsw (dense_embedding halfvec_cosine_ops)
     WITH (m = 16, ef_construction = 64);
 
 -- Create indexes for other fields
@@ -41,6 +41,6 @@ CREATE INDEX IF NOT EXISTS idx_chunks_sparse_gin ON document_chunks USING GIN(sp
 
 -- Add comments
 COMMENT ON TABLE document_chunks IS 'Stores document chunks with both dense and sparse embeddings using pgvector';
-COMMENT ON COLUMN document_chunks.dense_embedding IS 'Dense embedding vector (1024 dimensions) for similarity search';
+COMMENT ON COLUMN document_chunks.dense_embedding IS 'Dense embedding (1024 dimensions, half precision) for similarity search';
 COMMENT ON COLUMN document_chunks.sparse_embedding IS 'Sparse embedding as JSONB - stores only non-zero token_id:weight pairs';
 COMMENT ON COLUMN document_chunks.chunk_text IS 'The actual text content of the chunk';
\ No newline at end of file
@@ -1,12 +1,17 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from sqlalchemy import delete, select, text
+import functools
 import logging
 import os
 from concurrent.futures import ThreadPoolExecutor
 import asyncio
+from collections import OrderedDict
+from contextlib import asynccontextmanager
 
-from database.database import SessionLocal, test_connection, init_db
+from database.database import SessionLocal, engine, test_connection, init_db, DATABASE_URL
 from database import crud
+from api.utils import FastJSONResponse
 from api import auth, missions, system, chat, chats, documents, websockets, settings, writing, dashboard, admin
 from middleware import user_context_middleware
 
@@ -15,10 +20,21 @@ from logging_config import setup_logging
 setup_logging()  # Will use LOG_LEVEL environment variable
 logger = logging.getLogger(__name__)
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Run startup_event before serving requests and shutdown_event on exit."""
+    await startup_event()
+    try:
+        yield
+    finally:
+        await shutdown_event()
+
 app = FastAPI(
     title="MAESTRO API",
     description="AI Research Assistant API",
-    version="2.0.0-alpha"
+    version="2.0.0-alpha",
+    default_response_class=FastJSONResponse,
+    lifespan=lifespan
 )
 
 @app.get("/api/health")
@@ -27,13 +43,20 @@ def health_check():
     return {"status": "healthy"}
 
 # Configure CORS with environment variables
+@functools.lru_cache(maxsize=1)
 def get_cors_origins():
-    """Get CORS allowed origins from environment variables."""
+    """Get CORS allowed origins from environment variables (computed once per process)."""
     # Check if we should allow all origins (development mode with nginx proxy)
     allow_wildcard = os.getenv("ALLOW_CORS_WILDCARD", "false").lower() == "true"
     if allow_wildcard:
         logger.info("CORS: Allowing all origins (wildcard mode)")
-        return ["*"]
+        return ("*",)
+
+    # Get additional origins from environment variable
+    cors_origins_env = os.getenv("CORS_ALLOWED_ORIGINS", "")
+    if cors_origins_env == "*":
+        logger.info("CORS: Allowing all origins via CORS_ALLOWED_ORIGINS=*")
+        return ("*",)
     
     # Build default origins for backward compatibility
     default_origins = [
@@ -50,38 +73,33 @@ def get_cors_origins():
         "http://127.0.0.1:8001"
     ]
     
-    # Get additional origins from environment variable
-    cors_origins_env = os.getenv("CORS_ALLOWED_ORIGINS", "")
-    if cors_origins_env == "*":
-        logger.info("CORS: Allowing all origins via CORS_ALLOWED_ORIGINS=*")
-        return ["*"]
-    elif cors_origins_env:
+    additional_origins = []
+    if cors_origins_env:
         # Split by comma and strip whitespace
         additional_origins = [origin.strip() for origin in cors_origins_env.split(",") if origin.strip()]
-        # Combine with defaults, removing duplicates
-        all_origins = list(set(default_origins + additional_origins))
-        logger.info(f"CORS allowed origins configured: {all_origins}")
-        return all_origins
-    
-    # Also add origins based on old environment variables for backward compatibility
-    frontend_host = os.getenv("FRONTEND_HOST")
-    backend_host = os.getenv("BACKEND_HOST")
-    if frontend_host or backend_host:
+    else:
+        # Also add origins based on old environment variables for backward compatibility
+        frontend_host = os.getenv("FRONTEND_HOST")
+        backend_host = os.getenv("BACKEND_HOST")
         if frontend_host:
             frontend_port = os.getenv("FRONTEND_PORT", "3030")
-            default_origins.append(f"http://{frontend_host}:{frontend_port}")
-            default_origins.append(f"http://{frontend_host}")
+            additional_origins.append(f"http://{frontend_host}:{frontend_port}")
+            additional_origins.append(f"http://{frontend_host}")
         if backend_host:
             backend_port = os.getenv("BACKEND_PORT", "8001")
-            default_origins.append(f"http://{backend_host}:{backend_port}")
-            default_origins.append(f"http://{backend_host}")
-    
-    logger.info(f"CORS allowed origins (defaults): {list(set(default_origins))}")
-    return list(set(default_origins))
+            additional_origins.append(f"http://{backend_host}:{backend_port}")
+            additional_origins.append(f"http://{backend_host}")
+
+    # Combine with defaults, removing duplicates while preserving order
+    all_origins = tuple(dict.fromkeys(default_origins + additional_origins))
+    source = "configured" if cors_origins_env else "defaults"
+    logger.info(f"CORS allowed origins ({source}): {list(all_origins)}")
+    return all_origins
 
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=get_cors_origins(),
+    # Origins are fixed for the process lifetime; a frozenset gives O(1) lookups
+    allow_origins=frozenset(get_cors_origins()),
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
@@ -106,106 +124,189 @@ app.include_router(writing.router, tags=["writing"])
 app.include_router(websockets.router, tags=["websockets"])
 app.include_router(admin.router)
 
-@app.on_event("startup")
-async def startup_event():
-    """Initialize database, AI components and create first user on startup."""
-    # Only log at ERROR level or higher based on LOG_LEVEL setting
-    
-    # Store the main event loop reference for WebSocket updates from background threads
-    from ai_researcher.agentic_layer.context_manager import set_main_event_loop
-    set_main_event_loop()
-    
-    # Initialize database connection and tables
+# Number of uvicorn worker processes sharing this host's CPUs (see start.sh)
+WEB_CONCURRENCY = max(1, int(os.getenv("WEB_CONCURRENCY", "1")))
+
+# Advisory lock key electing the primary worker when running several uvicorn workers
+PRIMARY_WORKER_LOCK_ID = 1234567
+
+# Attempts to take the primary worker lock while the database is unreachable
+# (waiting 1, 2, 4, ... seconds in between) before startup fails
+PRIMARY_WORKER_LOCK_ATTEMPTS = 6
+
+
+def _acquire_primary_worker_lock():
+    """
+    Try to become the primary worker. Only the primary worker runs the one-time
+    startup work (DDL, first user, CLI cleanup) and the background document
+    processor; the others share the database through their connection pools.
+    Returns (is_primary, connection holding the session-level advisory lock).
+
+    The primary keeps that connection checked out of the engine's pool until
+    shutdown, so it has one connection fewer than DB_POOL_SIZE for requests.
+    """
+    if not DATABASE_URL.startswith("postgresql"):
+        return True, None
+
+    conn = engine.connect()
+    try:
+        acquired = conn.execute(
+            text("SELECT pg_try_advisory_lock(:lock_id)"), {"lock_id": PRIMARY_WORKER_LOCK_ID}
+        ).scalar()
+    except Exception:
+        conn.close()
+        raise
+    if not acquired:
+        conn.close()
+        return False, None
+    # End the implicit transaction; the session-level lock stays held until the connection closes
+    conn.commit()
+    return True, conn
+
+
+def _create_first_user_if_missing():
+    """Create first user for development if no users exist."""
+    db = SessionLocal()
+    try:
+        users = crud.get_users(db)
+        if not users:
+            from setup_first_user import create_first_user
+            create_first_user()
+    except Exception as e:
+        logger.error(f"Error during initial user check: {e}", exc_info=True)
+    finally:
+        db.close()
+
+
+async def _init_db(app: FastAPI) -> bool:
+    """Elect the primary worker and, on it, create tables and extensions. Returns whether this worker is primary."""
+    # Take the lock before anything else; a worker only runs the primary-only work
+    # while holding it. If the database stays unreachable, fail startup so the
+    # supervisor restarts the worker instead of running without any primary.
+    for attempt in range(PRIMARY_WORKER_LOCK_ATTEMPTS):
+        try:
+            is_primary_worker, app.state.primary_worker_lock = await asyncio.to_thread(_acquire_primary_worker_lock)
+            break
+        except Exception as e:
+            if attempt == PRIMARY_WORKER_LOCK_ATTEMPTS - 1:
+                logger.error(f"Could not acquire the primary worker lock: {e}", exc_info=True)
+                raise RuntimeError("Primary worker election failed; database unreachable") from e
+            delay = 2 ** attempt
+            logger.warning(f"Primary worker lock attempt {attempt + 1} failed ({e}); retrying in {delay}s")
+            await asyncio.sleep(delay)
+
+    if not is_primary_worker:
+        logger.info("Another worker is primary; skipping one-time database setup")
+        return False
+
     try:
         # Test database connection
-        if not test_connection():
+        if not await asyncio.to_thread(test_connection):
             logger.error("Failed to connect to database")
             raise Exception("Database connection failed")
-        
+
         # Initialize database tables
-        init_db()
+        await asyncio.to_thread(init_db)
         logger.info("Database initialized successfully")
         
         # For PostgreSQL, ensure required extensions are available
-        if os.getenv("DATABASE_URL", "").startswith("postgresql"):
+        if DATABASE_URL.startswith("postgresql"):
             from database.init_postgres import ensure_extensions
-            ensure_extensions()
+            await asyncio.to_thread(ensure_extensions)
             
     except Exception as e:
         logger.error(f"Database initialization failed: {e}", exc_info=True)
         # Continue anyway, as tables might already exist
-    
-    # Create a configurable thread pool
-    max_workers = int(os.getenv("MAX_WORKER_THREADS", "10"))
-    app.state.thread_pool = ThreadPoolExecutor(max_workers=max_workers)
 
-    # Initialize singleton components for dependency injection
+    # The embedding type conversion is a migration step (start.sh); refuse to serve
+    # with a column type that every chunk insert and search would cast wrongly
+    if DATABASE_URL.startswith("postgresql"):
+        from database.init_postgres import check_dense_embedding_type
+        await asyncio.to_thread(check_dense_embedding_type)
+    return True
+
+
+async def _init_models(app: FastAPI):
+    """Initialize singleton components for dependency injection."""
     try:
         from ai_researcher.agentic_layer.tool_registry import ToolRegistry
         from ai_researcher.core_rag.embedder import TextEmbedder
         from ai_researcher.core_rag.reranker import TextReranker
 
+        import torch
+
+        # Keep intra-op (BLAS) threads from oversubscribing the CPUs across workers
+        torch.set_num_threads(max(1, (os.cpu_count() or 1) // WEB_CONCURRENCY))
+
         app.state.tool_registry = ToolRegistry()
-        app.state.text_embedder = TextEmbedder()
-        app.state.text_reranker = TextReranker()
+        # Model loading is blocking; load both models concurrently off the event loop
+        embedder_task = asyncio.create_task(asyncio.to_thread(TextEmbedder))
+        reranker_task = asyncio.create_task(asyncio.to_thread(TextReranker))
+        app.state.text_embedder, app.state.text_reranker = await asyncio.gather(embedder_task, reranker_task)
         logger.info("Core components (ToolRegistry, TextEmbedder, TextReranker) initialized.")
     except Exception as e:
         logger.error(f"Failed to initialize core components: {e}", exc_info=True)
         # Depending on the severity, you might want to exit the application
         # For now, we'll log the error and continue, but some endpoints might fail.
 
-    # Create first user for development if no users exist
-    db = SessionLocal()
-    try:
-        users = crud.get_users(db)
-        if not users:
-            from setup_first_user import create_first_user
-            create_first_user()
-    except Exception as e:
-        logger.error(f"Error during initial user check: {e}", exc_info=True)
-    finally:
-        db.close()
-    
-    # Clean up dangling CLI-ingested documents
+
+async def _init_first_user(app: FastAPI):
+    """Create the development user off the event loop."""
+    await asyncio.to_thread(_create_first_user_if_missing)
+
+
+def _cleanup_dangling_cli_documents():
+    """Clean up documents left in cli_processing state by an interrupted CLI ingest."""
     db = SessionLocal()
     try:
-        from database.models import Document, document_group_association
+        from database.models import Document, DocumentProcessingJob, document_group_association
         logger.info("Checking for dangling CLI documents...")
         
-        # Find and clean up documents with cli_processing status
-        cli_documents = db.query(Document).filter(
-            Document.processing_status == "cli_processing"
-        ).all()
+        # Find documents with cli_processing status, streaming only the columns we need
+        rows = db.execute(
+            select(Document.id, Document.file_path)
+            .where(Document.processing_status == "cli_processing")
+            .execution_options(yield_per=500)
+        )
+        doc_ids = []
+        file_paths = []
+        for doc_id, file_path in rows:
+            doc_ids.append(doc_id)
+            if file_path:
+                file_paths.append(file_path)
+            file_paths.append(f"/app/data/markdown_files/{doc_id}.md")
         
-        if cli_documents:
-            logger.info(f"Found {len(cli_documents)} dangling CLI documents, cleaning up...")
-            deleted_count = 0
-            
-            for doc in cli_documents:
+        if doc_ids:
+            logger.info(f"Found {len(doc_ids)} dangling CLI documents, cleaning up...")
+
+            # Delete associated files
+            for path in file_paths:
                 try:
-                    # Delete associated files
-                    if doc.file_path and os.path.exists(doc.file_path):
-                        os.remove(doc.file_path)
-                    
-                    markdown_path = f"/app/data/markdown_files/{doc.id}.md"
-                    if os.path.exists(markdown_path):
-                        os.remove(markdown_path)
-                    
-                    # Remove from document groups
-                    db.execute(
-                        document_group_association.delete().where(
-                            document_group_association.c.document_id == doc.id
-                        )
-                    )
-                    
-                    # Delete document record
-                    db.delete(doc)
-                    deleted_count += 1
-                except Exception as e:
-                    logger.warning(f"Failed to clean up document {doc.id}: {e}")
-            
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                except OSError as e:
+                    logger.warning(f"Failed to remove file {path}: {e}")
+
+            # Remove from document groups, drop processing jobs (cascaded only at
+            # the ORM level) and delete the records in bulk
+            db.execute(
+                document_group_association.delete().where(
+                    document_group_association.c.document_id.in_(doc_ids)
+                )
+            )
+            db.execute(
+                delete(DocumentProcessingJob)
+                .where(DocumentProcessingJob.document_id.in_(doc_ids))
+                .execution_options(synchronize_session=False)
+            )
+            db.execute(
+                delete(Document)
+                .where(Document.id.in_(doc_ids))
+                .execution_options(synchronize_session=False)
+            )
             db.commit()
-            logger.info(f"Cleaned up {deleted_count} dangling CLI documents")
+            logger.info(f"Cleaned up {len(doc_ids)} dangling CLI documents")
         else:
             logger.debug("No dangling CLI documents found")
             
@@ -214,6 +315,49 @@ async def startup_event():
         # Don't fail startup if cleanup fails
     finally:
         db.close()
+
+
+async def _init_cli_cleanup(app: FastAPI):
+    """Run the CLI document cleanup off the event loop, alongside the other startup steps."""
+    await asyncio.to_thread(_cleanup_dangling_cli_documents)
+
+
+async def startup_event():
+    """Initialize database, AI components and create first user on startup."""
+    # Only log at ERROR level or higher based on LOG_LEVEL setting
+    
+    # Store the main event loop reference for WebSocket updates from background threads
+    from ai_researcher.agentic_layer.context_manager import set_main_event_loop
+    set_main_event_loop()
+    
+    # Initialize database connection and tables
+    is_primary_worker = await _init_db(app)
+    
+    # Create a configurable thread pool, split across worker processes by default
+    max_workers = int(os.getenv("MAX_WORKER_THREADS") or max(2, (os.cpu_count() or 1) // WEB_CONCURRENCY))
+    app.state.thread_pool = ThreadPoolExecutor(max_workers=max_workers)
+
+    # WritingController cache (by settings fingerprint) used by api.dependencies.get_writing_controller
+    app.state.writing_controllers = OrderedDict()
+
+    # Keep-alive HTTP client shared by all ModelDispatcher provider clients on this loop;
+    # sync dependencies have no running loop and receive it explicitly from app.state
+    from ai_researcher.agentic_layer.model_dispatcher import get_llm_http_client
+    app.state.llm_http_client = get_llm_http_client()
+
+    # Every worker forwards document progress notifications to its own WebSocket clients
+    if DATABASE_URL.startswith("postgresql"):
+        from services.document_progress_listener import listen_for_document_progress
+        app.state.document_progress_task = asyncio.create_task(listen_for_document_progress())
+
+    # Model loading, first-user creation and CLI cleanup are independent of each other
+    init_tasks = [_init_models(app)]
+    if is_primary_worker:
+        init_tasks += [_init_first_user(app), _init_cli_cleanup(app)]
+    results = await asyncio.gather(*init_tasks, return_exceptions=True)
+    for result in results:
+        if isinstance(result, Exception):
+            logger.error(f"Startup task failed: {result}", exc_info=result)
     
     # Initialize AI research components
     try:
@@ -236,24 +380,21 @@ async def startup_event():
     # except Exception as e:
     #     logger.error(f"Failed to run consistency check: {e}", exc_info=True)
 
-    # Start the background document processor
+    # Start the background document processor (one per deployment, not per worker)
+    if not is_primary_worker:
+        return
     try:
         from services.background_document_processor import background_processor
-        import threading
-
-        # Run the processor in a daemon thread
-        processor_thread = threading.Thread(target=background_processor.start, daemon=True)
-        processor_thread.start()
 
         app.state.background_processor = background_processor
-        app.state.processor_thread = processor_thread
+
+        app.state.background_processor_task = asyncio.create_task(background_processor.run())
         logger.info("Background document processor started.")
 
     except Exception as e:
         logger.error(f"Failed to start background document processor: {e}", exc_info=True)
 
 
-@app.on_event("shutdown")
 async def shutdown_event():
     """Clean up resources on shutdown."""
     # Only log at ERROR level or higher based on LOG_LEVEL setting
@@ -264,7 +405,25 @@ async def shutdown_event():
     if hasattr(app.state, "background_processor"):
         logger.info("Shutting down background document processor...")
         app.state.background_processor.shutdown()
-        # It's a daemon thread, so we don't strictly need to join it
+
+    if hasattr(app.state, "background_processor_task"):
+        app.state.background_processor_task.cancel()
+        await asyncio.gather(app.state.background_processor_task, return_exceptions=True)
+
+    if hasattr(app.state, "document_progress_task"):
+        app.state.document_progress_task.cancel()
+        await asyncio.gather(app.state.document_progress_task, return_exceptions=True)
+
+    # Release the primary worker lock explicitly; closing only returns the connection to the pool
+    lock_conn = getattr(app.state, "primary_worker_lock", None)
+    if lock_conn is not None:
+        try:
+            lock_conn.execute(text("SELECT pg_advisory_unlock(:lock_id)"), {"lock_id": PRIMARY_WORKER_LOCK_ID})
+        finally:
+            lock_conn.close()
+
+    from ai_researcher.agentic_layer.model_dispatcher import close_llm_http_client
+    await close_llm_http_client()
 
     # No need to stop monitoring since we only run once at startup
     pass
@@ -5,32 +5,115 @@
 Background document processor service for handling asynchronous document processing
 with real-time progress updates via WebSocket.
 
-This service implements a queue-based system to process documents one at a time
-to avoid GPU VRAM conflicts while keeping the processing non-blocking.
+This service implements a queue-based system in which up to DOC_PROCESSOR_WORKERS
+documents are converted in parallel while the embedding stage runs one document
+at a time to avoid GPU VRAM conflicts, keeping the processing non-blocking.
 """
 import asyncio
+import copy
+import logging
+import os
+import shutil
 import uuid
-import json
-import traceback
-from threading import Thread, RLock, Event
+from collections import OrderedDict
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import asyncpg
+from threading import Thread, Lock, RLock, Event
 from pathlib import Path
-from typing import Dict, Any, Optional, Callable, List
+from typing import Dict, Any, Optional, Callable, List, Tuple, TYPE_CHECKING
 from datetime import datetime
 from sqlalchemy.orm import Session
-import time
-from sqlalchemy import text 
-from dataclasses import dataclass
+from sqlalchemy import text
+from dataclasses import dataclass, field
+import numpy as np
+import orjson
 
-from ai_researcher.core_rag.processor import DocumentProcessor
+# DocumentProcessor, TextEmbedder and the AI database pull in torch/transformers/
+# Marker and are imported on first use, so API workers that only import this
+# module for background_processor don't pay for them
 from ai_researcher.core_rag.vector_store_singleton import get_vector_store
 from ai_researcher.core_rag.pgvector_store import PGVectorStore as VectorStore  # For type hints
-from ai_researcher.core_rag.embedder import TextEmbedder
-try:
-    from ai_researcher.core_rag.unified_database import UnifiedDocumentDatabase as Database
-except ImportError:
-    from ai_researcher.core_rag.database import Database
+from ai_researcher.core_rag.pgvector_store import DENSE_DIMENSION
+from ai_researcher.core_rag.metadata_extractor import MetadataExtractor
+from ai_researcher.core_rag.embedding_cache import ChunkEmbeddingCache
+from ai_researcher.agentic_layer.model_dispatcher import settings_fingerprint
 from database import crud, models
-from database.database import get_db
+from database.crud_documents_improved import cleanup_failed_document_improved
+from database.database import get_db, DATABASE_URL
+from services.document_parsing import get_file_type_handler
+from logging_config import setup_logging
+
+if TYPE_CHECKING:
+    from ai_researcher.core_rag.processor import DocumentProcessor
+    from ai_researcher.core_rag.embedder import TextEmbedder
+    from ai_researcher.core_rag.unified_database import UnifiedDocumentDatabase as Database
+
+logger = logging.getLogger(__name__)
+
+# Seconds between queue checks when LISTEN/NOTIFY is unavailable (SQLite)
+QUEUE_POLL_INTERVAL = 30
+
+# Documents converted in parallel (each worker process loads its own Marker
+# models); embedding stays serialized across workers by _embed_lock
+DOC_PROCESSOR_WORKERS = max(1, int(os.getenv("DOC_PROCESSOR_WORKERS", "1")))
+
+# Chunk embeddings kept per job worker, keyed by chunk text, so reprocessed or
+# overlapping documents only embed new chunks (about 5 KB each; 0 disables)
+DOC_PROCESSOR_EMBEDDING_CACHE_SIZE = int(os.getenv("DOC_PROCESSOR_EMBEDDING_CACHE_SIZE", "20000"))
+
+# Load the processor and embedding models in the job workers when the standalone
+# service starts instead of on the first document (never inside the API process)
+DOC_PROCESSOR_WARMUP = os.getenv("DOC_PROCESSOR_WARMUP", "true").lower() == "true"
+
+# Metadata extractors kept for distinct user settings (least recently used evicted)
+METADATA_EXTRACTOR_CACHE_SIZE = 32
+
+# Metadata JSON files stay human-readable (2-space indent, UTF-8)
+METADATA_JSON_OPTIONS = orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+# Seconds between writes of buffered progress; status changes are written immediately
+PROGRESS_FLUSH_INTERVAL = 0.5
+
+UPDATE_DOCUMENT_PROGRESS_SQL = text("""
+UPDATE documents
+SET upload_progress = :progress,
+    processing_status = :status,
+    processing_error = COALESCE(:error, processing_error)
+WHERE id = :doc_id AND user_id = :user_id
+""")
+
+FINALIZE_DOCUMENT_SQL = text("""
+UPDATE documents
+SET processing_status = 'completed',
+    upload_progress = 100,
+    chunk_count = :chunk_count,
+    updated_at = :now,
+    metadata_ = COALESCE(metadata_, '{}'::jsonb) || CAST(:patch AS jsonb)
+WHERE id = :doc_id AND user_id = :user_id
+RETURNING id
+""")
+
+# Serializes the GPU embedding stage. Replaced in each job worker process by
+# the lock shared across the pool, see _init_job_worker.
+_embed_lock = Lock()
+
+def _init_job_worker(embed_lock):
+    """Initializer of the job worker processes."""
+    global _embed_lock
+    _embed_lock = embed_lock
+    setup_logging()
+
+def warm_up_job_worker() -> bool:
+    """Executor task loading this worker process's models ahead of the first job."""
+    return background_processor.warm_up()
+
+def _new_job_executor(max_workers: int = DOC_PROCESSOR_WORKERS) -> ProcessPoolExecutor:
+    """Spawned job worker processes sharing one embedding lock."""
+    ctx = multiprocessing.get_context("spawn")
+    return ProcessPoolExecutor(max_workers=max_workers, mp_context=ctx,
+                               initializer=_init_job_worker, initargs=(ctx.Lock(),))
 
 @dataclass
 class ProcessingJob:
@@ -41,6 +124,9 @@ class ProcessingJob:
     file_path: Path
     original_filename: str
     created_at: datetime
+    # Read once when the job is dequeued so processing doesn't re-query them
+    user_settings: Dict[str, Any] = field(default_factory=dict)
+    existing_metadata: Dict[str, Any] = field(default_factory=dict)
 
 class BackgroundDocumentProcessor:
     """Service for processing documents in the background with progress tracking."""
@@ -59,152 +145,261 @@ class BackgroundDocumentProcessor:
         self._embedder = None
         self._ai_db = None
         self._processor = None
+        self._metadata_extractors: "OrderedDict[str, MetadataExtractor]" = OrderedDict()
+        self._embedding_cache = ChunkEmbeddingCache(DOC_PROCESSOR_EMBEDDING_CACHE_SIZE)
         self._components_lock = RLock()
         
-        self.is_processing = False
-        self.current_job: Optional[ProcessingJob] = None
+        self._active_jobs = 0
+        self._active_jobs_lock = Lock()
         self.shutdown_event = Event()
+
+        # Worker processes running the jobs while run() is active
+        self._executor: Optional[ProcessPoolExecutor] = None
         
         # WebSocket connections for progress updates
         self.websocket_connections: Dict[str, List] = {}
 
+        # Latest unflushed progress per document, see _update_progress_sync
+        self._progress_buffer: Dict[str, Dict[str, Any]] = {}
+        self._flushed_status: Dict[str, str] = {}
+        self._progress_lock = Lock()
+        self._flush_lock = Lock()
+        self._progress_flusher: Optional[Thread] = None
+
+    @property
+    def is_processing(self) -> bool:
+        return self._active_jobs > 0
+
     def start(self):
-        """Start the background worker thread."""
-        print("Document processing worker started")
-        self._worker_loop()
+        """Run the worker loop until shutdown (standalone service entry point)."""
+        logger.info("Document processing worker started")
+        asyncio.run(self.run(warm_up=DOC_PROCESSOR_WARMUP))
 
-    def _worker_loop(self):
-        """Main worker loop that listens for notifications or polls for queued documents."""
-        # Get a long-lived database connection for listening
-        from database.database import engine
+    async def run(self, database_url: str = DATABASE_URL, warm_up: bool = False):
+        """
+        Main worker loop, as a coroutine. On PostgreSQL new documents are
+        announced via LISTEN on a dedicated asyncpg connection (outside the
+        SQLAlchemy pool); the queue is also re-checked every
+        QUEUE_POLL_INTERVAL seconds as a safety net for lost notifications,
+        which is the only trigger elsewhere. DOC_PROCESSOR_WORKERS threads
+        drain the queue concurrently (each claims documents with SKIP LOCKED
+        and waits on its job in the process pool), so the listener stays
+        responsive. With warm_up the job workers load their models right away;
+        otherwise models load lazily with the first document.
+        """
+        # Notifications only mark the queue as dirty: any number of them that
+        # arrive while a drain is running collapse into a single extra pass,
+        # so a burst of NOTIFYs never turns into a backlog of scheduled work.
+        new_document = asyncio.Event()
+        coalesced = 0
 
-        while not self.shutdown_event.is_set():
-            try:
-                with engine.connect() as conn:
-                    # Enable autocommit for LISTEN/NOTIFY
-                    conn.execution_options(isolation_level="AUTOCOMMIT")
-                    
-                    # Listen on the document_queue channel
-                    conn.execute(text("LISTEN document_queue"))
-                    print("Worker is listening for document notifications...")
-                    
-                    while not self.shutdown_event.is_set():
-                        # Process all documents currently in the queue first
-                        while self._process_next_document():
-                            pass
-
-                        # Now wait for notifications
-                        import select
-                        select.select([conn.connection], [], [], 60) # Wait for 60 seconds
-
-                        # After waiting, process any notifications received
-                        conn.connection.poll()
-                        while conn.connection.notifies:
-                            notification = conn.connection.notifies.pop(0)
-                            print(f"Received notification: {notification.payload}")
-                            # A notification just means there's a new job, so we process the queue
-                            self._process_next_document()
+        def on_new_document(connection, pid, channel, payload):
+            nonlocal coalesced
+            coalesced += 1
+            new_document.set()
 
-            except Exception as e:
-                # Replace the incorrect print statement
-                # print(f"Error in worker listener loop: {e}", exc_info=True)
+        def on_listener_closed(connection):
+            # Wake the loop so it notices the lost connection and reconnects
+            new_document.set()
+
+        # Jobs run in a separate process so Marker/embedding work cannot starve
+        # this loop (and the API process it may share) of the GIL. CUDA cannot
+        # be used from forked children, hence spawn.
+        self._executor = _new_job_executor()
+        if warm_up:
+            self._start_warm_up()
+
+        listener = None
+        try:
+            while not self.shutdown_event.is_set():
+                if listener is None and database_url.startswith("postgresql"):
+                    try:
+                        listener = await self._connect_listener(database_url, on_new_document, on_listener_closed)
+                    except Exception as e:
+                        logger.error(f"Error in worker listener loop: {e}", exc_info=True)
+                        logger.warning("Falling back to polling mode for %s seconds.", QUEUE_POLL_INTERVAL)
 
-                # With a proper logger call
-                logging.error(f"Error in worker listener loop: {e}", exc_info=True)
-                print("Falling back to polling mode for 30 seconds.")
-                time.sleep(30)
+                results = await asyncio.gather(
+                    *(asyncio.to_thread(self.process_queue) for _ in range(DOC_PROCESSOR_WORKERS)),
+                    return_exceptions=True
+                )
+                for result in results:
+                    if isinstance(result, Exception):
+                        logger.error(f"Error draining document queue: {result}", exc_info=result)
+
+                try:
+                    await asyncio.wait_for(new_document.wait(), QUEUE_POLL_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
+                new_document.clear()
+                if coalesced > 1:
+                    logger.debug(f"Coalesced {coalesced} document_queue notifications into one drain")
+                coalesced = 0
+
+                if listener is not None and listener.is_closed():
+                    logger.warning("Document queue listener connection lost, reconnecting...")
+                    listener = None
+        finally:
+            if listener is not None and not listener.is_closed():
+                await listener.close()
+            executor, self._executor = self._executor, None
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def warm_up(self) -> bool:
+        """
+        Builds the shared processor (Marker models, embedder, vector store) and
+        runs one tiny embedding so CUDA context creation and kernel selection
+        happen now rather than while the first document is waiting.
+        """
+        try:
+            processor = self._get_processor()
+            processor.embedder.embed_query("warmup")
+            logger.info("Document processor components warmed up")
+            return True
+        except Exception as e:
+            logger.warning(f"Document processor warm-up failed; components load on first use: {e}")
+            return False
+
+    def _start_warm_up(self):
+        """Starts every job worker process and warms it up in the background."""
+        if self._executor is None:
+            return
+        # While no worker is idle each submission spawns another process, up to the pool size
+        for _ in range(DOC_PROCESSOR_WORKERS):
+            self._executor.submit(warm_up_job_worker)
+
+    async def _connect_listener(self, database_url: str, on_notify, on_close):
+        """Open a dedicated asyncpg connection listening on the document_queue channel."""
+        dsn = database_url.replace("postgresql+psycopg2://", "postgresql://", 1)
+        listener = await asyncpg.connect(dsn)
+        listener.add_termination_listener(on_close)
+        await listener.add_listener("document_queue", on_notify)
+        logger.info("Worker is listening for document notifications...")
+        return listener
+
+    def process_queue(self) -> int:
+        """Processes queued documents until the queue is empty. Returns the number processed."""
+        processed = 0
+        while not self.shutdown_event.is_set() and self._process_next_document():
+            processed += 1
+        return processed
 
     def _process_next_document(self) -> bool:
         """Fetches and processes the next queued document. Returns True if a job was processed."""
         db = next(get_db())
         document = None
+        job = None
         try:
             document = crud.get_next_queued_document(db)
             if not document:
                 return False
 
-            self.is_processing = True
+            with self._active_jobs_lock:
+                self._active_jobs += 1
             job = ProcessingJob(
                 job_id=str(uuid.uuid4()),
                 doc_id=document.id,
                 user_id=document.user_id,
                 file_path=Path(document.file_path),
                 original_filename=document.filename,
-                created_at=document.created_at
+                created_at=document.created_at,
+                user_settings=dict(document.user.settings or {}) if document.user else {},
+                existing_metadata=dict(document.metadata_ or {})
             )
-            self.current_job = job
 
-            print(f"[{job.doc_id}] Found queued document. Starting processing.")
+            logger.info("[%s] Found queued document. Starting processing.", job.doc_id)
+            # Commits the claim and releases the row lock; other workers skip it by status now
             crud.update_document_status(db, document.id, document.user_id, "processing", 0)
-            db.commit() # Commit status change before processing
 
-            success = self._process_document_sync(job)
+            success = self._run_job(job)
 
+            # A successful job already marked the document completed when it was finalized
             final_status = "completed" if success else "failed"
-            crud.update_document_status(db, document.id, document.user_id, final_status, 100)
 
             if not success:
-                print(f"[{job.doc_id}] Processing failed, performing cleanup...")
+                crud.update_document_status(db, document.id, document.user_id, final_status, 100)
+                logger.warning("[%s] Processing failed, performing cleanup...", job.doc_id)
                 try:
-                    from database.crud_documents_improved import cleanup_failed_document_improved
                     cleanup_success = cleanup_failed_document_improved(db, document.id, document.user_id)
                     if cleanup_success:
-                        print(f"[{job.doc_id}] Successfully cleaned up failed processing artifacts")
+                        logger.info("[%s] Successfully cleaned up failed processing artifacts", job.doc_id)
                     else:
-                        print(f"[{job.doc_id}] Warning: Cleanup encountered some issues")
+                        logger.warning("[%s] Cleanup encountered some issues", job.doc_id)
                 except Exception as cleanup_error:
-                    print(f"[{job.doc_id}] Error during cleanup: {cleanup_error}")
+                    logger.error("[%s] Error during cleanup: %s", job.doc_id, cleanup_error)
 
-            print(f"[{job.doc_id}] Document processing finished with status: {final_status}")
+            logger.info("[%s] Document processing finished with status: %s", job.doc_id, final_status)
 
         except Exception as e:
-            print(f"Error processing document: {e}", exc_info=True)
-            if self.current_job:
-                crud.update_document_status(db, self.current_job.doc_id, self.current_job.user_id, "failed", 0)
+            logger.exception("Error processing document: %s", e)
+            if job:
+                db.rollback()
+                crud.update_document_status(db, job.doc_id, job.user_id, "failed", 0)
                 try:
-                    from database.crud_documents_improved import cleanup_failed_document_improved
-                    cleanup_failed_document_improved(db, self.current_job.doc_id, self.current_job.user_id)
-                    print(f"[{self.current_job.doc_id}] Cleaned up after unexpected error")
+                    cleanup_failed_document_improved(db, job.doc_id, job.user_id)
+                    logger.info("[%s] Cleaned up after unexpected error", job.doc_id)
                 except Exception as cleanup_error:
-                    print(f"[{self.current_job.doc_id}] Cleanup after error failed: {cleanup_error}")
+                    logger.error("[%s] Cleanup after error failed: %s", job.doc_id, cleanup_error)
         finally:
-            self.is_processing = False
-            self.current_job = None
+            if job:
+                with self._active_jobs_lock:
+                    self._active_jobs -= 1
             db.commit()
             db.close()
 
         return document is not None
     
     
+    def _run_job(self, job: ProcessingJob) -> bool:
+        """Processes a job in the worker process when one is running, otherwise inline."""
+        executor = self._executor
+        if executor is None:
+            return self._process_document_sync(job)
+        try:
+            return executor.submit(process_document_job, job).result()
+        except BrokenProcessPool:
+            # The worker died (e.g. OOM while converting); start a fresh one for the next job
+            logger.error(f"[{job.doc_id}] Document worker process terminated unexpectedly", exc_info=True)
+            if self._executor is executor:
+                self._executor = _new_job_executor()
+            executor.shutdown(wait=False)
+            return False
+
     def _get_vector_store(self) -> VectorStore:
         """Get or initialize the vector store (thread-safe)."""
         with self._components_lock:
             if self._vector_store is None:
-                print("Initializing VectorStore singleton...")
+                logger.info("Initializing VectorStore singleton...")
                 self._vector_store = get_vector_store()
             return self._vector_store
     
-    def _get_embedder(self) -> TextEmbedder:
+    def _get_embedder(self) -> "TextEmbedder":
         """Get or initialize the embedder (thread-safe)."""
         with self._components_lock:
             if self._embedder is None:
-                print("Initializing TextEmbedder...")
+                from ai_researcher.core_rag.embedder import TextEmbedder
+                logger.info("Initializing TextEmbedder...")
                 self._embedder = TextEmbedder(model_name="BAAI/bge-m3")
             return self._embedder
     
-    def _get_ai_db(self) -> Database:
+    def _get_ai_db(self) -> "Database":
         """Get or initialize the AI researcher database (thread-safe)."""
         with self._components_lock:
             if self._ai_db is None:
-                print("Initializing AI Database...")
+                try:
+                    from ai_researcher.core_rag.unified_database import UnifiedDocumentDatabase as Database
+                except ImportError:
+                    from ai_researcher.core_rag.database import Database
+                logger.info("Initializing AI Database...")
                 self._ai_db = Database(db_path=self.db_path)
             return self._ai_db
     
-    def _get_processor(self) -> DocumentProcessor:
+    def _get_processor(self) -> "DocumentProcessor":
         """Get or initialize the document processor (thread-safe)."""
         with self._components_lock:
             if self._processor is None:
-                print("Initializing DocumentProcessor...")
+                from ai_researcher.core_rag.processor import DocumentProcessor
+                logger.info("Initializing DocumentProcessor...")
                 embedder = self._get_embedder()
                 vector_store = self._get_vector_store()
                 
@@ -219,30 +414,27 @@ class BackgroundDocumentProcessor:
                 )
             return self._processor
     
-    def _get_processor_with_user_settings(self, user_settings: Dict[str, Any]) -> DocumentProcessor:
-        """Get or initialize the document processor with user-specific settings (thread-safe)."""
+    def _get_processor_with_user_settings(self, user_settings: Dict[str, Any]) -> "DocumentProcessor":
+        """
+        Returns the shared document processor using a metadata extractor
+        configured from `user_settings` (thread-safe). Extractors are cached
+        per settings fingerprint; the processor itself, with its Marker models,
+        is built once and shallow-copied so the models are never duplicated.
+        """
         with self._components_lock:
-            print("Initializing DocumentProcessor with user settings...")
-            embedder = self._get_embedder()
-            vector_store = self._get_vector_store()
-            
-            # Create a metadata extractor with user settings
-            from ai_researcher.core_rag.metadata_extractor import MetadataExtractor
-            metadata_extractor = MetadataExtractor.from_user_settings(user_settings)
-            
-            processor = DocumentProcessor(
-                pdf_dir=self.pdf_dir,
-                markdown_dir=self.markdown_dir,
-                metadata_dir=self.metadata_dir,
-                db_path=self.db_path,
-                embedder=embedder,
-                vector_store=vector_store,
-                force_reembed=False
-            )
-            
-            # Replace the default metadata extractor with the user-configured one
+            key = settings_fingerprint(user_settings)
+            metadata_extractor = self._metadata_extractors.get(key)
+            if metadata_extractor is None:
+                logger.info("Creating metadata extractor for new user settings...")
+                metadata_extractor = MetadataExtractor.from_user_settings(user_settings)
+                self._metadata_extractors[key] = metadata_extractor
+                if len(self._metadata_extractors) > METADATA_EXTRACTOR_CACHE_SIZE:
+                    self._metadata_extractors.popitem(last=False)
+            else:
+                self._metadata_extractors.move_to_end(key)
+
+            processor = copy.copy(self._get_processor())
             processor.metadata_extractor = metadata_extractor
-            
             return processor
     
     def add_websocket_connection(self, user_id: str, websocket):
@@ -261,231 +453,201 @@ class BackgroundDocumentProcessor:
             except ValueError:
                 pass  # Connection not in list
     
-    def _send_progress_update_sync(self, user_id: str, update: Dict[str, Any]):
-        """Sends a progress update to the main backend via an internal API call."""
-        import requests
-        
-        # The main backend service is available at this hostname in the Docker network
-        backend_url = "http://maestro-backend:8000/api/internal/document-progress"
-        
-        try:
-            # Add user_id to the update payload if it's not already there
-            if 'user_id' not in update:
-                update['user_id'] = int(user_id)
-            
-            response = requests.post(backend_url, json=update, timeout=5)
-            response.raise_for_status()
-            print(f"Successfully sent progress update to backend for user {user_id}")
-        except requests.exceptions.RequestException as e:
-            print(f"Error sending progress update to backend: {e}")
-    
-    def _update_document_progress_sync(self, doc_id: str, user_id: int, progress: int, 
-                                     status: str, error_message: Optional[str] = None):
-        """Update document progress in database and send WebSocket update (synchronous)."""
-        # Get database session
-        db = next(get_db())
+    def _update_progress_sync(self, job: ProcessingJob, progress: int, status: str,
+                              error_message: Optional[str] = None, db: Optional[Session] = None):
+        """
+        Record non-terminal progress for a job's document. Updates are buffered
+        (only the latest per document is kept) and written on status transitions
+        immediately, otherwise by the periodic flusher. Terminal statuses are
+        written directly, see _end_progress.
+        """
+        entry = {
+            "doc_id": job.doc_id,
+            "user_id": job.user_id,
+            "progress": progress,
+            "job_status": status,
+            "status": "processing" if status == "running" else status,
+            "error": error_message
+        }
+        with self._progress_lock:
+            self._progress_buffer[job.doc_id] = entry
+            is_transition = self._flushed_status.get(job.doc_id) != status
+
+        if is_transition:
+            self.flush_progress(db=db)
+        else:
+            self._ensure_progress_flusher()
+
+    def _end_progress(self, job: ProcessingJob, db: Session):
+        """
+        Writes the job's buffered progress and forgets its document, so no later
+        flush can overwrite the terminal status written next.
+        """
+        self.flush_progress(db=db)
+        with self._flush_lock:
+            self._flushed_status.pop(job.doc_id, None)
+
+    def _mark_failed(self, job: ProcessingJob, error_message: str, db: Session):
+        """Writes the terminal failed status directly, after any buffered progress."""
+        db.rollback()
+        self._end_progress(job, db)
         try:
-            # Update document in database
-            document = crud.get_document(db, doc_id=doc_id, user_id=user_id)
-            if document:
-                document.upload_progress = progress
-                document.processing_status = status
-                if error_message:
-                    document.processing_error = error_message
-                db.commit()
-            
-            # Send WebSocket update
-            update = {
-                "type": "document_progress",
-                "doc_id": doc_id,
-                "progress": progress,
-                "status": status,
-                "error": error_message,
-                "timestamp": datetime.utcnow().isoformat()
-            }
-            self._send_progress_update_sync(str(user_id), update)
-            
+            db.execute(UPDATE_DOCUMENT_PROGRESS_SQL, {
+                "doc_id": job.doc_id,
+                "user_id": job.user_id,
+                "progress": 0,
+                "status": "failed",
+                "error": error_message
+            })
+            db.commit()
         except Exception as e:
-            print(f"Error updating document progress: {e}")
-        finally:
-            db.close()
-    
-    def _update_job_progress_sync(self, job_id: str, user_id: int, progress: int, 
-                                status: str, error_message: Optional[str] = None):
-        """Update processing job progress in database and send WebSocket update (synchronous)."""
-        # Get database session
-        db = next(get_db())
-        try:
-            # Update job in database
-            job = db.query(models.DocumentProcessingJob).filter(
-                models.DocumentProcessingJob.id == job_id,
-                models.DocumentProcessingJob.user_id == user_id
-            ).first()
-            
-            if job:
-                job.progress = progress
-                job.status = status
-                if error_message:
-                    job.error_message = error_message
-                if status == "running" and not job.started_at:
-                    job.started_at = datetime.utcnow()
-                elif status in ["completed", "failed"]:
-                    job.completed_at = datetime.utcnow()
+            db.rollback()
+            logger.error("[%s] Error marking document as failed: %s", job.doc_id, e)
+
+    def _ensure_progress_flusher(self):
+        if self._progress_flusher is None or not self._progress_flusher.is_alive():
+            self._progress_flusher = Thread(target=self._progress_flush_loop, name="progress-flusher", daemon=True)
+            self._progress_flusher.start()
+
+    def _progress_flush_loop(self):
+        while not self.shutdown_event.wait(PROGRESS_FLUSH_INTERVAL):
+            self.flush_progress()
+
+    def flush_progress(self, db: Optional[Session] = None):
+        """
+        Write all buffered progress with one bulk UPDATE. The
+        document_progress trigger publishes the changes to the backend's
+        WebSocket clients. Uses the caller's session when given, otherwise a
+        fresh one.
+        """
+        with self._flush_lock:
+            with self._progress_lock:
+                entries = list(self._progress_buffer.values())
+                self._progress_buffer.clear()
+            if not entries:
+                return
+
+            owns_db = db is None
+            if owns_db:
+                db = next(get_db())
+            try:
+                db.execute(UPDATE_DOCUMENT_PROGRESS_SQL, entries)
                 db.commit()
-            
-            # Send WebSocket update
-            update = {
-                "type": "job_progress",
-                "job_id": job_id,
-                "document_id": job.document_id if job else None,
-                "progress": progress,
-                "status": status,
-                "error_message": error_message,
-                "timestamp": datetime.utcnow().isoformat()
-            }
-            # self._send_progress_update_sync(str(user_id), update) # Websockets not used in this service
-            
-        except Exception as e:
-            print(f"Error updating job progress: {e}")
-        finally:
-            db.close()
+            except Exception as e:
+                db.rollback()
+                logger.error("Error updating document progress: %s", e)
+            finally:
+                if owns_db:
+                    db.close()
+
+            for entry in entries:
+                self._flushed_status[entry["doc_id"]] = entry["job_status"]
     
-    def _process_document_sync(self, job: ProcessingJob) -> bool:
-        """Process a document synchronously in the worker thread."""
+    def _convert_stage(self, job: ProcessingJob, processor: "DocumentProcessor") -> Tuple[Dict[str, Any], List[Dict[str, Any]]]:
+        """
+        CPU-bound part of a job: Markdown conversion, metadata extraction and
+        chunking. Safe to run for several documents at once. Returns the
+        document metadata and its chunks.
+        """
         doc_id = job.doc_id
-        user_id = job.user_id
         file_path = job.file_path
         original_filename = job.original_filename
-        job_id = job.job_id
+
+        # Step 2: Process document to Markdown (30% progress)
+        handler = get_file_type_handler(original_filename)
+        logger.info("[%s] Starting %s processing...", doc_id, Path(original_filename).suffix[1:].upper())
+        self._update_progress_sync(job, 30, "running")
         
-        try:
-            # Update status to running
-            self._update_job_progress_sync(job_id, user_id, 0, "running")
-            self._update_document_progress_sync(doc_id, user_id, 0, "processing")
-            
-            # Step 1: Get user settings and initialize processor (10% progress)
-            print(f"[{doc_id}] Getting user settings and initializing document processor...")
-            self._update_job_progress_sync(job_id, user_id, 10, "running")
-            
-            # Get user settings from database
-            db = next(get_db())
+        # Copy the uploaded file to the expected location with the correct name
+        # For backwards compatibility, PDFs go to pdf_dir, others to subdirs
+        target_dir = self.pdf_dir / handler.subdir if handler.subdir else self.pdf_dir
+        target_dir.mkdir(parents=True, exist_ok=True)
+        target_path = target_dir / f"{doc_id}_{original_filename}"
+            
+        if not target_path.exists():
+            # Hardlink when both paths share a filesystem; the upload is kept
+            # at file_path since the document row still points at it
             try:
-                from database import crud
-                user = crud.get_user(db, user_id)
-                user_settings = user.settings if user and user.settings else {}
-                print(f"[{doc_id}] Retrieved user settings for user {user_id}")
-            except Exception as e:
-                print(f"[{doc_id}] Warning: Could not retrieve user settings: {e}")
-                user_settings = {}
-            finally:
-                db.close()
-            
-            processor = self._get_processor_with_user_settings(user_settings)
-            
-            # Step 2: Process document to Markdown (30% progress)
-            file_extension = original_filename.lower().split('.')[-1]
-            print(f"[{doc_id}] Starting {file_extension.upper()} processing...")
-            self._update_job_progress_sync(job_id, user_id, 30, "running")
-            self._update_document_progress_sync(doc_id, user_id, 30, "processing")
-            
-            # Copy the uploaded file to the expected location with the correct name
-            # For backwards compatibility, PDFs go to pdf_dir, others to subdirs
-            if original_filename.lower().endswith('.pdf'):
-                target_path = self.pdf_dir / f"{doc_id}_{original_filename}"
-            elif original_filename.lower().endswith(('.docx', '.doc')):
-                word_dir = self.pdf_dir / 'word_documents'
-                word_dir.mkdir(parents=True, exist_ok=True)
-                target_path = word_dir / f"{doc_id}_{original_filename}"
-            elif original_filename.lower().endswith(('.md', '.markdown')):
-                markdown_dir = self.pdf_dir / 'markdown_files'
-                markdown_dir.mkdir(parents=True, exist_ok=True)
-                target_path = markdown_dir / f"{doc_id}_{original_filename}"
-            else:
-                raise Exception(f"Unsupported file format: {original_filename}")
-                
-            if not target_path.exists():
-                import shutil
+                os.link(file_path, target_path)
+                logger.debug("[%s] Linked file into processor directory: %s", doc_id, target_path)
+            except OSError:
                 shutil.copy2(file_path, target_path)
-                print(f"[{doc_id}] Copied file to processor directory: {target_path}")
-            
-            # Step 3: Extract metadata and convert to Markdown (50% progress)
-            print(f"[{doc_id}] Extracting metadata and converting to Markdown...")
-            self._update_job_progress_sync(job_id, user_id, 50, "running")
-            self._update_document_progress_sync(doc_id, user_id, 50, "processing")
-            
-            # Extract metadata using appropriate method based on file type
-            if original_filename.lower().endswith('.pdf'):
-                initial_text = processor._extract_header_footer_text(target_path)
-            else:
-                initial_text = processor.document_converter.extract_initial_text_for_metadata(target_path)
-            
-            extracted_metadata = processor.metadata_extractor.extract(initial_text)
-            
-            if extracted_metadata:
-                final_metadata = {"doc_id": doc_id, "original_filename": original_filename}
-                final_metadata.update(extracted_metadata)
-            else:
-                final_metadata = {"doc_id": doc_id, "original_filename": original_filename}
-            
-            # Convert document to Markdown based on file type
-            if original_filename.lower().endswith('.pdf'):
-                print(f"[{doc_id}] Converting PDF to Markdown using Marker with intelligent table handling...")
-                markdown_content = processor._convert_pdf_with_table_handling(target_path)
-            elif original_filename.lower().endswith(('.docx', '.doc')):
-                print(f"[{doc_id}] Converting Word document to Markdown...")
-                markdown_content = processor.document_converter.convert_word_to_markdown(target_path)
-            elif original_filename.lower().endswith(('.md', '.markdown')):
-                print(f"[{doc_id}] Reading Markdown file content...")
-                markdown_content = processor.document_converter.read_markdown_file(target_path)
-            else:
-                raise Exception(f"Unsupported file format for processing: {original_filename}")
-            
-            if not markdown_content:
-                raise Exception(f"Document processing produced empty markdown content for {original_filename}")
-            
-            # Save markdown with our doc_id
-            md_filename = f"{doc_id}.md"
-            md_save_path = processor.markdown_dir / md_filename
-            with open(md_save_path, "w", encoding="utf-8") as f:
-                f.write(markdown_content)
-            print(f"[{doc_id}] Saved Markdown to: {md_save_path}")
-            
-            # Save metadata with our doc_id
-            metadata_filename = f"{doc_id}.json"
-            metadata_save_path = processor.metadata_dir / metadata_filename
-            with open(metadata_save_path, "w", encoding="utf-8") as f:
-                import json
-                json.dump(final_metadata, f, indent=2, ensure_ascii=False)
-            print(f"[{doc_id}] Saved metadata to: {metadata_save_path}")
-            
-            # No separate AI database anymore - everything is in the main database
-            # The metadata was already saved to JSON file above for reference
-            
-            # Step 4: Generate embeddings (70% progress)
-            print(f"[{doc_id}] Generating embeddings...")
-            self._update_job_progress_sync(job_id, user_id, 70, "running")
-            self._update_document_progress_sync(doc_id, user_id, 70, "processing")
-            
-            # Chunk the content
-            print(f"[{doc_id}] Chunking Markdown content...")
-            chunks = processor.chunker.chunk(markdown_content, doc_metadata=final_metadata)
-            print(f"[{doc_id}] Generated {len(chunks)} chunks")
-            
+                logger.debug("[%s] Copied file to processor directory: %s", doc_id, target_path)
+        
+        # Step 3: Extract metadata and convert to Markdown (50% progress)
+        logger.info("[%s] Extracting metadata and converting to Markdown...", doc_id)
+        self._update_progress_sync(job, 50, "running")
+        
+        # Extract metadata using appropriate method based on file type
+        initial_text = handler.extract_initial_text(processor, target_path)
+        
+        extracted_metadata = processor.metadata_extractor.extract(initial_text)
+        
+        if extracted_metadata:
+            final_metadata = {"doc_id": doc_id, "original_filename": original_filename}
+            final_metadata.update(extracted_metadata)
+        else:
+            final_metadata = {"doc_id": doc_id, "original_filename": original_filename}
+        
+        # Convert document to Markdown based on file type
+        logger.info("[%s] Converting %s: %s", doc_id, handler.description, target_path)
+        markdown_content = handler.convert(processor, target_path)
+        
+        if not markdown_content:
+            raise Exception(f"Document processing produced empty markdown content for {original_filename}")
+        
+        # Save markdown with our doc_id
+        md_filename = f"{doc_id}.md"
+        md_save_path = processor.markdown_dir / md_filename
+        md_save_path.write_text(markdown_content, encoding="utf-8")
+        logger.debug("[%s] Saved Markdown to: %s", doc_id, md_save_path)
+        
+        # Save metadata with our doc_id
+        metadata_filename = f"{doc_id}.json"
+        metadata_save_path = processor.metadata_dir / metadata_filename
+        metadata_save_path.write_bytes(orjson.dumps(final_metadata, option=METADATA_JSON_OPTIONS))
+        logger.debug("[%s] Saved metadata to: %s", doc_id, metadata_save_path)
+        
+        # No separate AI database anymore - everything is in the main database
+        # The metadata was already saved to JSON file above for reference
+        
+        # Step 4: Generate embeddings (70% progress)
+        logger.info("[%s] Generating embeddings...", doc_id)
+        self._update_progress_sync(job, 70, "running")
+        
+        # Chunk the content
+        logger.debug("[%s] Chunking Markdown content...", doc_id)
+        chunks = processor.chunker.chunk(markdown_content, doc_metadata=final_metadata)
+        logger.info("[%s] Generated %d chunks", doc_id, len(chunks))
+
+        return final_metadata, chunks
+
+    def _embed_stage(self, job: ProcessingJob, processor: "DocumentProcessor", chunks: List[Dict[str, Any]]) -> int:
+        """
+        GPU part of a job: embeds the chunks and stores them. Serialized across
+        all job workers by _embed_lock. Returns the number of chunks stored.
+        """
+        doc_id = job.doc_id
+
+        with _embed_lock:
             # Step 5: Store in vector database (90% progress)
-            print(f"[{doc_id}] Storing in vector database...")
-            self._update_job_progress_sync(job_id, user_id, 90, "running")
-            self._update_document_progress_sync(doc_id, user_id, 90, "processing")
-            
+            logger.info("[%s] Storing in vector database...", doc_id)
+            self._update_progress_sync(job, 90, "running")
+        
             # Embed and store chunks
             if processor.embedder and processor.vector_store and chunks:
-                print(f"[{doc_id}] Embedding {len(chunks)} chunks...")
-                chunks_with_embeddings = processor.embedder.embed_chunks(chunks)
-                
-                # Extract embeddings from chunks for vector store
-                dense_embeddings = [chunk["embeddings"]["dense"] for chunk in chunks_with_embeddings]
+                logger.debug("[%s] Embedding %d chunks...", doc_id, len(chunks))
+                hits_before = self._embedding_cache.hits
+                chunks_with_embeddings = self._embedding_cache.embed_chunks(chunks, processor.embedder.embed_chunks)
+                logger.debug("[%s] %d chunk embeddings served from cache", doc_id, self._embedding_cache.hits - hits_before)
+            
+                # Gather dense vectors into one contiguous float32 matrix; sparse stays a list of dicts
+                dense_embeddings = np.empty((len(chunks_with_embeddings), DENSE_DIMENSION), dtype=np.float32)
+                for i, chunk in enumerate(chunks_with_embeddings):
+                    dense_embeddings[i] = chunk["embeddings"]["dense"]
                 sparse_embeddings = [chunk["embeddings"]["sparse"] for chunk in chunks_with_embeddings]
-                
-                print(f"[{doc_id}] Adding chunks to vector store in batches...")
+            
+                logger.debug("[%s] Adding chunks to vector store in batches...", doc_id)
                 processor.vector_store.add_chunks(
                     doc_id=doc_id,
                     chunks=chunks_with_embeddings,
@@ -494,125 +656,151 @@ class BackgroundDocumentProcessor:
                     batch_size=50  # Process 50 chunks at a time for better performance
                 )
                 chunks_added_count = len(chunks)
-                print(f"[{doc_id}] Successfully added {chunks_added_count} chunks to vector store")
+                logger.info("[%s] Added %d chunks to vector store", doc_id, chunks_added_count)
             else:
                 chunks_added_count = 0
-                print(f"[{doc_id}] Skipping embedding/storing: No embedder or vector store")
+                logger.warning("[%s] Skipping embedding/storing: No embedder or vector store", doc_id)
+
+        return chunks_added_count
+
+    def _process_document_sync(self, job: ProcessingJob, db: Optional[Session] = None) -> bool:
+        """
+        Process a document synchronously in the worker thread. One session
+        (the caller's, or our own) is used for all database work; it is
+        released around the long conversion/embedding steps and checked out
+        again from the pool afterwards.
+        """
+        doc_id = job.doc_id
+        user_id = job.user_id
+        original_filename = job.original_filename
+        job_id = job.job_id
+
+        owns_db = db is None
+        if owns_db:
+            db = next(get_db())
+        
+        try:
+            # Update status to running
+            self._update_progress_sync(job, 0, "running", db=db)
+            
+            # Don't hold a connection through conversion and embedding
+            db.close()
+            
+            # Step 1: Initialize processor with the user's settings (10% progress)
+            logger.info("[%s] Initializing document processor with settings for user %s...", doc_id, user_id)
+            self._update_progress_sync(job, 10, "running")
+            
+            processor = self._get_processor_with_user_settings(job.user_settings)
+            
+            final_metadata, chunks = self._convert_stage(job, processor)
+            chunks_added_count = self._embed_stage(job, processor, chunks)
+            chunks_generated = len(chunks)
             
             processing_result = {
                 "doc_id": doc_id,
                 "original_filename": original_filename,
-                "chunks_generated": len(chunks),
+                "chunks_generated": chunks_generated,
                 "chunks_added_to_vector_store": chunks_added_count,
                 "extracted_metadata": final_metadata
             }
             
-            print(f"[{doc_id}] Processing completed successfully!")
-            print(f"[{doc_id}] Generated {processing_result.get('chunks_generated', 0)} chunks")
-            print(f"[{doc_id}] Added {processing_result.get('chunks_added_to_vector_store', 0)} chunks to vector store")
+            logger.info(
+                "[%s] Processing completed successfully: %d chunks generated, %d added to vector store",
+                doc_id, processing_result.get('chunks_generated', 0),
+                processing_result.get('chunks_added_to_vector_store', 0)
+            )
             
-            # Step 6: Complete (100% progress)
-            self._update_job_progress_sync(job_id, user_id, 100, "completed")
-            self._update_document_progress_sync(doc_id, user_id, 100, "completed")
+            # Step 6: Complete (100% progress). The terminal status is written by
+            # FINALIZE_DOCUMENT_SQL together with chunk_count and metadata, so
+            # progress listeners never see a completed document without them
+            self._end_progress(job, db)
             
-            # Update chunk count in the database
-            db_temp = next(get_db())
+            # Update status, chunk count and document metadata with processing results
             try:
-                crud.update_document_status(db_temp, doc_id, user_id, "completed", 100, 
-                                           chunk_count=chunks_added_count)
-            finally:
-                db_temp.close()
-            
-            # Update document metadata with processing results
-            db = next(get_db())
-            try:
-                document = crud.get_document(db, doc_id=doc_id, user_id=user_id)
-                if document:
-                    # Get extracted metadata
-                    extracted_metadata = processing_result.get('extracted_metadata', {})
-                    
-                    # Preserve existing metadata (like file_hash) and merge with new metadata
-                    existing_metadata = document.metadata_ or {}
-                    
-                    # Format metadata for UI expectations
-                    formatted_metadata = {
-                        "title": extracted_metadata.get('title'),
-                        "authors": extracted_metadata.get('authors'),
-                        "publication_year": extracted_metadata.get('publication_year') or extracted_metadata.get('year'),
-                        "journal_or_source": extracted_metadata.get('journal_or_source') or extracted_metadata.get('journal'),
-                        "abstract": extracted_metadata.get('abstract'),
-                        "doi": extracted_metadata.get('doi'),
-                        "keywords": extracted_metadata.get('keywords'),
-                        "processed_at": datetime.utcnow().isoformat(),
-                        "processing_job_id": job_id,
-                        "status": "completed",
-                        "chunks_generated": processing_result.get('chunks_generated', 0),
-                        "chunks_added_to_vector_store": processing_result.get('chunks_added_to_vector_store', 0)
-                    }
-                    
-                    # Merge existing metadata with new metadata, preserving important fields like file_hash
-                    merged_metadata = {**existing_metadata, **formatted_metadata}
-                    
-                    # Store in metadata_ field which UI expects
-                    document.metadata_ = merged_metadata
-                    
-                    # Debug: Print what we're saving
-                    print(f"[{doc_id}] Saving formatted metadata to database:")
-                    print(f"  - Title: {merged_metadata.get('title')}")
-                    print(f"  - Authors: {merged_metadata.get('authors')}")
-                    print(f"  - Journal: {merged_metadata.get('journal_or_source')}")
-                    print(f"  - Year: {merged_metadata.get('publication_year')}")
-                    print(f"  - File Hash: {merged_metadata.get('file_hash', 'NOT SET')}")
-                    
-                    # Also set title and authors at top level if columns exist (for schema compatibility)
-                    if hasattr(document, 'title') and formatted_metadata.get('title'):
-                        document.title = formatted_metadata['title']
-                    if hasattr(document, 'authors') and formatted_metadata.get('authors'):
-                        authors = formatted_metadata['authors']
-                        document.authors = json.dumps(authors) if isinstance(authors, list) else str(authors)
-                    
-                    # Update chunk_count with actual number of chunks added
-                    if hasattr(document, 'chunk_count'):
-                        document.chunk_count = processing_result.get('chunks_added_to_vector_store', 0)
-                    
-                    db.commit()
-                    print(f"[{doc_id}] Updated document metadata in database")
+                # Get extracted metadata
+                extracted_metadata = processing_result.get('extracted_metadata', {})
+                
+                # Format metadata for UI expectations
+                formatted_metadata = {
+                    "title": extracted_metadata.get('title'),
+                    "authors": extracted_metadata.get('authors'),
+                    "publication_year": extracted_metadata.get('publication_year') or extracted_metadata.get('year'),
+                    "journal_or_source": extracted_metadata.get('journal_or_source') or extracted_metadata.get('journal'),
+                    "abstract": extracted_metadata.get('abstract'),
+                    "doi": extracted_metadata.get('doi'),
+                    "keywords": extracted_metadata.get('keywords'),
+                    "processed_at": datetime.utcnow().isoformat(),
+                    "processing_job_id": job_id,
+                    "status": "completed",
+                    "chunks_generated": processing_result.get('chunks_generated', 0),
+                    "chunks_added_to_vector_store": processing_result.get('chunks_added_to_vector_store', 0)
+                }
+                
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug(
+                        "[%s] Saving formatted metadata to database: title=%r, authors=%r, "
+                        "journal=%r, year=%r, file_hash=%s",
+                        doc_id, formatted_metadata.get('title'), formatted_metadata.get('authors'),
+                        formatted_metadata.get('journal_or_source'), formatted_metadata.get('publication_year'),
+                        job.existing_metadata.get('file_hash', 'NOT SET')
+                    )
+                
+                # One UPDATE, no prior SELECT; the metadata_ field which UI expects is patched
+                # in place by PostgreSQL, keeping existing fields like file_hash
+                updated = db.execute(FINALIZE_DOCUMENT_SQL, {
+                    "chunk_count": chunks_added_count,
+                    "now": crud.get_current_time(),
+                    "patch": orjson.dumps(formatted_metadata, option=orjson.OPT_NON_STR_KEYS).decode(),
+                    "doc_id": doc_id,
+                    "user_id": user_id
+                }).scalar()
+                db.commit()
+                if updated is not None:
+                    logger.debug("[%s] Updated document metadata in database", doc_id)
             except Exception as e:
-                print(f"Error updating document metadata: {e}")
-            finally:
-                db.close()
+                db.rollback()
+                logger.error("[%s] Error updating document metadata: %s", doc_id, e)
+                raise
             
             return True
             
         except Exception as e:
             error_msg = f"Processing failed: {str(e)}"
-            print(f"[{doc_id}] Document processing error: {error_msg}")
-            print(traceback.format_exc())
+            logger.exception("[%s] Document processing error: %s", doc_id, error_msg)
             
             # Update status to failed
-            self._update_job_progress_sync(job_id, user_id, 0, "failed", error_msg)
-            self._update_document_progress_sync(doc_id, user_id, 0, "failed", error_msg)
+            self._mark_failed(job, error_msg, db)
             
             return False
             
         finally:
-            # This part is handled by the main worker loop now
-            pass
+            if owns_db:
+                db.close()
 
     def shutdown(self):
         """Shutdown the background processor."""
-        print("Setting shutdown event for background processor.")
+        logger.info("Setting shutdown event for background processor.")
         self.shutdown_event.set()
 
 # Global instance
 background_processor = BackgroundDocumentProcessor()
 
+
+def process_document_job(job: ProcessingJob) -> bool:
+    """
+    Executor entry point: processes `job` in the worker process using that
+    process's own processor instance (components are loaded on first use and
+    reused for later jobs). Must stay a top-level function to be picklable.
+    """
+    return background_processor._process_document_sync(job)
+
 if __name__ == "__main__":
-    print("Background document processor service starting.")
+    setup_logging()
+    logger.info("Background document processor service starting.")
     try:
         background_processor.start()
     except KeyboardInterrupt:
-        print("Shutdown signal received. Stopping processor...")
+        logger.info("Shutdown signal received. Stopping processor...")
     finally:
         background_processor.shutdown()
-        print("Background processor shut down.")
+        logger.info("Background processor shut down.")
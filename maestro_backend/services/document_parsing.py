@@ -0,0 +1,54 @@
+"""
+File-type dispatch for the background document processor: where each type
+is stored and how it is read for metadata and converted to Markdown (Marker
+for PDFs, python-docx for Word files, plain reads for Markdown).
+"""
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional
+
+
+@dataclass(frozen=True)
+class FileTypeHandler:
+    """How one file type is stored, read for metadata and converted, given a DocumentProcessor."""
+    subdir: Optional[str]  # Directory under the processor's pdf_dir; None for pdf_dir itself
+    extract_initial_text: Callable[[Any, Path], str]
+    convert: Callable[[Any, Path], str]
+    description: str
+
+
+_PDF = FileTypeHandler(
+    subdir=None,
+    extract_initial_text=lambda processor, path: processor._extract_header_footer_text(path),
+    convert=lambda processor, path: processor._convert_pdf_with_table_handling(path),
+    description="PDF to Markdown using Marker with intelligent table handling",
+)
+_WORD = FileTypeHandler(
+    subdir="word_documents",
+    extract_initial_text=lambda processor, path: processor.document_converter.extract_initial_text_for_metadata(path),
+    convert=lambda processor, path: processor.document_converter.convert_word_to_markdown(path),
+    description="Word document to Markdown",
+)
+_MARKDOWN = FileTypeHandler(
+    subdir="markdown_files",
+    extract_initial_text=lambda processor, path: processor.document_converter.extract_initial_text_for_metadata(path),
+    convert=lambda processor, path: processor.document_converter.read_markdown_file(path),
+    description="Markdown file content",
+)
+
+FILE_TYPE_HANDLERS: Dict[str, FileTypeHandler] = {
+    ".pdf": _PDF,
+    ".docx": _WORD,
+    ".doc": _WORD,
+    ".md": _MARKDOWN,
+    ".markdown": _MARKDOWN,
+}
+
+
+def get_file_type_handler(original_filename: str) -> FileTypeHandler:
+    """Returns the handler for a file name's suffix, or raises for unsupported types."""
+    handler = FILE_TYPE_HANDLERS.get(Path(original_filename).suffix.lower())
+    if handler is None:
+        raise Exception(f"Unsupported file format for processing: {original_filename}")
+    return handler
+
@@ -0,0 +1,69 @@
+"""
+Forwards document progress published by PostgreSQL to WebSocket clients.
+
+Every UPDATE of a document's progress or status fires the document_progress
+trigger (see database.database), which NOTIFYs a small JSON payload. Each
+backend worker LISTENs on that channel over a dedicated asyncpg connection and
+delivers the updates to the connections of the owning user that it holds.
+"""
+import asyncio
+import json
+import logging
+
+import asyncpg
+
+from api.websockets import send_document_update
+from database.database import DATABASE_URL, DOCUMENT_PROGRESS_CHANNEL
+
+logger = logging.getLogger(__name__)
+
+# Seconds to wait before reconnecting a lost or failed listener connection
+RECONNECT_DELAY = 5
+
+
+async def _deliver_updates(updates: asyncio.Queue):
+    """Sends queued updates one by one so each user sees them in commit order."""
+    while True:
+        update = await updates.get()
+        try:
+            await send_document_update(str(update["user_id"]), update)
+        except Exception as e:
+            logger.debug(f"Error broadcasting document update: {e}")
+
+
+async def listen_for_document_progress(database_url: str = DATABASE_URL):
+    """Runs until cancelled, reconnecting whenever the listener connection drops."""
+    updates: asyncio.Queue = asyncio.Queue()
+
+    def on_progress(connection, pid, channel, payload):
+        try:
+            updates.put_nowait(json.loads(payload))
+        except ValueError:
+            logger.warning(f"Ignoring malformed document progress payload: {payload!r}")
+
+    deliverer = asyncio.create_task(_deliver_updates(updates))
+    dsn = database_url.replace("postgresql+psycopg2://", "postgresql://", 1)
+    try:
+        while True:
+            try:
+                listener = await asyncpg.connect(dsn)
+            except Exception as e:
+                logger.error(f"Could not connect document progress listener: {e}")
+                await asyncio.sleep(RECONNECT_DELAY)
+                continue
+
+            closed = asyncio.Event()
+            try:
+                listener.add_termination_listener(lambda connection: closed.set())
+                await listener.add_listener(DOCUMENT_PROGRESS_CHANNEL, on_progress)
+                logger.info("Listening for document progress notifications")
+                await closed.wait()
+                logger.warning("Document progress listener connection lost, reconnecting...")
+            except Exception as e:
+                logger.error(f"Document progress listener failed, reconnecting: {e}")
+            finally:
+                if not listener.is_closed():
+                    await listener.close()
+            await asyncio.sleep(RECONNECT_DELAY)
+    finally:
+        deliverer.cancel()
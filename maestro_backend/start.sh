@@ -28,6 +28,14 @@ if [[ "$DATABASE_URL" == postgresql* ]]; then
     else
         echo "⚠️  PostgreSQL initialization had issues (may be already initialized)"
     fi
+
+    # Converting stored embeddings rewrites document_chunks under an exclusive lock,
+    # so it runs here before the server starts; the API refuses to start on a mismatch
+    echo "🧮 Migrating stored chunk embeddings to ${PGVECTOR_DENSE_TYPE:-halfvec} if needed..."
+    if ! python -m database.init_postgres --migrate-dense-embeddings; then
+        echo "❌ Dense embedding migration failed; fix it or set PGVECTOR_DENSE_TYPE to the current column type"
+        exit 1
+    fi
 fi
 
 # Skip migrations - PostgreSQL schema is managed via SQL files
@@ -37,4 +45,12 @@ echo "📊 Skipping migrations (PostgreSQL schema managed via SQL files)"
 echo "🌐 Starting FastAPI server..."
 # Convert LOG_LEVEL to lowercase for uvicorn
 UVICORN_LOG_LEVEL=$(echo "${LOG_LEVEL:-error}" | tr '[:upper:]' '[:lower:]')
-exec uvicorn main:app --host 0.0.0.0 --port 8000 --reload --log-level $UVICORN_LOG_LEVEL --timeout-keep-alive 1800 --timeout-graceful-shutdown 1800 
\ No newline at end of file
+# WEB_CONCURRENCY > 1 runs several worker processes; --reload only supports a single one
+WEB_CONCURRENCY=${WEB_CONCURRENCY:-1}
+if [ "$WEB_CONCURRENCY" -gt 1 ]; then
+    echo "👷 Running $WEB_CONCURRENCY uvicorn workers"
+    WORKER_ARGS="--workers $WEB_CONCURRENCY"
+else
+    WORKER_ARGS="--reload"
+fi
+exec uvicorn main:app --host 0.0.0.0 --port 8000 $WORKER_ARGS --log-level $UVICORN_LOG_LEVEL --timeout-keep-alive 1800 --timeout-graceful-shutdown 1800 
\ No newline at end of file
@@ -1,4 +1,5 @@
 import json
+from collections import namedtuple
 import pytest
 import asyncio
 import re # <-- Import re module
@@ -10,23 +11,31 @@ from ai_researcher.agentic_layer.agents.research_agent import ResearchAgent
 from ai_researcher.agentic_layer.schemas.notes import Note
 from ai_researcher import config
 
+_WS_RE = re.compile(r'\s+')
+
+# Plain stand-ins for the chat completion objects returned by _call_llm
+LLMResponse = namedtuple("LLMResponse", "choices")
+Choice = namedtuple("Choice", "message")
+Message = namedtuple("Message", "content")
+
 # Mock dependencies that ResearchAgent needs
-@pytest.fixture
+# Module-scoped: building the agent and its AsyncMocks once is enough, reset_agent_mocks clears them between tests
+@pytest.fixture(scope="module")
 def mock_model_dispatcher():
     return MagicMock()
 
-@pytest.fixture
+@pytest.fixture(scope="module")
 def mock_tool_registry():
     return MagicMock()
 
-@pytest.fixture
+@pytest.fixture(scope="module")
 def mock_query_preparer():
     # Mock the async method prepare_queries
     preparer = MagicMock()
     preparer.prepare_queries = AsyncMock(return_value=(["mock query"], [{"model": "q_prep_model"}]))
     return preparer
 
-@pytest.fixture
+@pytest.fixture(scope="module")
 def research_agent(mock_model_dispatcher, mock_tool_registry, mock_query_preparer):
     # Instantiate the agent with mocked dependencies
     agent = ResearchAgent(
@@ -42,8 +51,57 @@ def research_agent(mock_model_dispatcher, mock_tool_registry, mock_query_prepare
     agent._read_full_document_if_needed = AsyncMock()
     return agent
 
+@pytest.fixture(autouse=True)
+def reset_agent_mocks(research_agent):
+    # Drop calls, return values and side effects configured by the previous test
+    for mock in (research_agent._call_llm, research_agent._execute_tool, research_agent._read_full_document_if_needed):
+        mock.reset_mock(return_value=True, side_effect=True)
+
 # --- Tests for _extract_content_windows ---
 
+@pytest.fixture(scope="session")
+def cd8e859b_md():
+    # Real processed Markdown, read once per session (synchronous read for test setup simplicity)
+    md_path = Path("ai_researcher/data/processed/markdown/cd8e859b.md") # Use correct hash filename
+    try:
+        return md_path.read_text(encoding='utf-8')
+    except FileNotFoundError:
+        pytest.fail(f"Test Markdown file not found at {md_path}")
+    except Exception as e:
+        pytest.fail(f"Failed to read test Markdown {md_path}: {e}")
+
+@pytest.fixture(scope="session")
+def bench_markdown():
+    # Real processed Markdown (1f8c82f6.md), read and decoded once per session
+    markdown_path = Path("ai_researcher/data/processed/markdown/1f8c82f6.md")
+    try:
+        return markdown_path.read_text(encoding='utf-8')
+    except FileNotFoundError:
+        pytest.fail(f"Test Markdown file not found at {markdown_path}")
+    except Exception as e:
+        pytest.fail(f"Failed to read test Markdown {markdown_path}: {e}")
+
+# Start/end markers of chunks 10, 11 and 12 in 1f8c82f6.md, in document order
+# (These markers are illustrative; adjust based on actual MD content)
+_BENCH_CHUNK_MARKERS = (
+    (10, "CBD has emerged as a practical way", "dual variables are non-zero."),
+    (11, "Classical Benders Decomposition can be applied", "feasible solution to the master problem."),
+    (12, "A core contribution of this work regards *disaggregation*", "facility location problems."), # Marker with markdown
+)
+
+@pytest.fixture(scope="session")
+def bench_chunk_spans(bench_markdown):
+    # (start, end) of each chunk, located once per session in one forward pass: each start
+    # marker search resumes at the previous chunk's start, each end marker search at its own
+    # start. str.index raises ValueError (a fixture error naming the marker) if one is missing.
+    spans = {}
+    search_from = 0
+    for chunk_number, start_marker, end_marker in _BENCH_CHUNK_MARKERS:
+        start_index = bench_markdown.index(start_marker, search_from)
+        spans[chunk_number] = (start_index, bench_markdown.index(end_marker, start_index) + len(end_marker))
+        search_from = start_index
+    return spans
+
 @pytest.mark.asyncio
 async def test_extract_content_windows_simple(research_agent, monkeypatch):
     """
@@ -126,11 +184,13 @@ async def test_extract_content_windows_split(research_agent, monkeypatch):
     """Test window splitting with fuzzy matching on realistic text."""
     # 1. Arrange
     filename = "test_doc_split.pdf"
-    messy_doc_content = "This is a long document preamble... " * 500 + \
-                        "Here is the first   chunk we want to find. It has some text. " + \
-                        "This is a very long section of text in between the two chunks... " * 500 + \
-                        "And here is the second chunk, which should NOT be merged. " + \
-                        "This is a long document postamble... " * 500
+    messy_doc_content = "".join(
+        ["This is a long document preamble... "] * 500
+        + ["Here is the first   chunk we want to find. It has some text. "]
+        + ["This is a very long section of text in between the two chunks... "] * 500
+        + ["And here is the second chunk, which should NOT be merged. "]
+        + ["This is a long document postamble... "] * 500
+    )
     clean_chunk_1 = "first chunk we want to find"
     clean_chunk_2 = "second chunk, which should NOT be merged"
 
@@ -193,13 +253,13 @@ async def test_extract_content_windows_edge_cases(research_agent, monkeypatch):
     assert windows_end[0]["end_omitted"] is False
 
 
-    @pytest.mark.skip(reason="Test data file is missing")
-    @pytest.mark.asyncio
-    async def test_extract_content_windows_normalization_merge_adjacent(research_agent, monkeypatch):
-        """
-        Test window extraction with whitespace normalization and merging of adjacent chunks.
-        Uses content from a real PDF example.
-        """
+@pytest.mark.skip(reason="Test data file is missing")
+@pytest.mark.asyncio
+async def test_extract_content_windows_normalization_merge_adjacent(research_agent, monkeypatch, cd8e859b_md):
+    """
+    Test window extraction with whitespace normalization and merging of adjacent chunks.
+    Uses content from a real PDF example.
+    """
     # 1. Arrange
     filename = "Adaptable Security Maturity Assessment and Standardization for Digital SMEs.pdf"
     # Real PDF content (truncated for brevity in comment, full content used in mock)
@@ -269,16 +329,9 @@ security maturity modeling.
 8,14,38
 ... [rest of the PDF content] ...
     """
-    # Read the actual full content from the MARKDOWN file to mock accurately
-    md_path = Path("ai_researcher/data/processed/markdown/cd8e859b.md") # Use correct hash filename
+    # The actual full content from the MARKDOWN file is used to mock accurately
+    full_md_content = cd8e859b_md
     pdf_filename_meta = "Adaptable Security Maturity Assessment and Standardization for Digital SMEs.pdf" # Filename from metadata
-    try:
-        # This uses a synchronous read for test setup simplicity
-        full_md_content = md_path.read_text(encoding='utf-8')
-    except FileNotFoundError:
-        pytest.fail(f"Test Markdown file not found at {md_path}")
-    except Exception as e:
-         pytest.fail(f"Failed to read test Markdown {md_path}: {e}")
 
 
     # Mock chunks from Section 2.2 (adjacent) - reverted to exact text from cd8e859b.md
@@ -319,8 +372,8 @@ security maturity modeling.
     normalized_chunk2_frag = "European Digital SME Alliance focuses on two challenges of SMEs: cybersecurity and standardization that are to be addressed by distinguishing the SME categories[.27](#page-14-7)"
     normalized_chunk3_frag = "The categorization in [Table 1](#page-2-1) takes into account the different security requirements of digital SMEs that originate from their various roles in the digital ecosystem."
     # Normalize the fragments for assertion checking just like the main function does
-    normalized_chunk2_frag = re.sub(r'\s+', ' ', normalized_chunk2_frag).strip()
-    normalized_chunk3_frag = re.sub(r'\s+', ' ', normalized_chunk3_frag).strip()
+    normalized_chunk2_frag = _WS_RE.sub(' ', normalized_chunk2_frag).strip()
+    normalized_chunk3_frag = _WS_RE.sub(' ', normalized_chunk3_frag).strip()
 
     assert normalized_chunk2_frag in merged_window["content"]
     assert normalized_chunk3_frag in merged_window["content"]
@@ -338,162 +391,6 @@ security maturity modeling.
     assert 200 < len(merged_window["content"]) < 500 # Rough check based on window size 300
 
 
-# --- Test commented out due to using incorrect filename/path logic ---
-# @pytest.mark.asyncio
-# async def test_extract_content_windows_normalization_merge_adjacent(research_agent, monkeypatch):
-#     """
-#     Test window extraction with whitespace normalization and merging of adjacent chunks.
-#     Uses content from a real PDF example.
-#     """
-#     # 1. Arrange
-#     filename = "Adaptable Security Maturity Assessment and Standardization for Digital SMEs.pdf" # Incorrect filename used here
-#     # Read the actual full content from the MARKDOWN file to mock accurately
-#     md_path = Path("ai_researcher/data/processed/markdown/Adaptable Security Maturity Assessment and Standardization for Digital SMEs.md") # Incorrect path used here
-#     pdf_filename_meta = "Adaptable Security Maturity Assessment and Standardization for Digital SMEs.pdf" # Filename from metadata
-#     try:
-#         # This uses a synchronous read for test setup simplicity
-#         full_md_content = md_path.read_text(encoding='utf-8')
-#     except FileNotFoundError:
-#         pytest.fail(f"Test Markdown file not found at {md_path}")
-#     except Exception as e:
-#          pytest.fail(f"Failed to read test Markdown {md_path}: {e}")
-#
-#
-#     # Mock chunks from Section 2.2 (adjacent) - with extra whitespace/newlines
-#     chunk2_text = """The European Digital SME Alliance focuses on two
-# challenges of SMEs: cybersecurity and standardization
-# that are to be addressed by distinguishing the SME
-# categories.""" # Note the newlines
-#     chunk3_text = """The categorization in Table 1 takes into
-# account the different security requirements of digital
-# SMEs that originate from their various roles in the
-# digital ecosystem.""" # Note the newlines
-#
-#     mock_chunks = [
-#         {
-#             "id": "adapt_sme_chunk2",
-#             "text": chunk2_text,
-#             "metadata": { "original_filename": filename, "doc_id": "adapt_sme", "chunk_id": 15 } # Example metadata
-#         },
-#         {
-#             "id": "adapt_sme_chunk3",
-#             "text": chunk3_text,
-#             "metadata": { "original_filename": filename, "doc_id": "adapt_sme", "chunk_id": 16 } # Example metadata
-#         }
-#     ]
-#
-#     monkeypatch.setattr(config, 'RESEARCH_NOTE_CONTENT_LIMIT', 300) # Window size
-#     monkeypatch.setattr(config, 'MAX_PLANNING_CONTEXT_CHARS', 1000) # Max merged window size
-#
-#     # Mock _read_full_document_if_needed to return the actual MD content when PDF filename is requested
-#     mock_read_result = (full_md_content, {"tool_name": "read_full_document"}, pdf_filename_meta)
-#     research_agent._read_full_document_if_needed.return_value = mock_read_result
-#
-#     # 2. Act
-#     # Use the PDF filename from metadata, as the main code does
-#     windows = await research_agent._extract_content_windows(pdf_filename_meta, mock_chunks)
-#
-#     # 3. Assert
-#     research_agent._read_full_document_if_needed.assert_awaited_once()
-#     assert len(windows) == 1 # Should merge into one window
-#
-#     merged_window = windows[0]
-#     # Check that the merged window contains parts of both original (unnormalized) chunks
-#     # We check the unnormalized text because the window extraction uses original content
-#     assert "European Digital SME Alliance focuses on two" in merged_window["content"]
-#     assert "challenges of SMEs: cybersecurity and standardization" in merged_window["content"]
-#     assert "distinguishing the SME \ncategories." in merged_window["content"] # Check with original newline
-#     assert "categorization in Table 1 takes into" in merged_window["content"]
-#     assert "roles in the \ndigital ecosystem." in merged_window["content"] # Check with original newline
-#
-#     # Check flags (assuming these chunks are not at the very start/end of the full PDF)
-#     assert merged_window["beginning_omitted"] is True
-#     assert merged_window["end_omitted"] is True
-#
-#     # Optional: Check length is reasonable (around window_size, but merge might extend it)
-#     # The exact length depends on the precise location found after normalization.
-#     # Let's check it's not excessively large or small.
-#     assert 200 < len(merged_window["content"]) < 500 # Rough check based on window size 300
-
-
-# --- Tests for _generate_note_from_content ---
-
-@pytest.mark.asyncio
-#     """
-#     Test window extraction with whitespace normalization and merging of adjacent chunks.
-#     Uses content from a real PDF example.
-#     """
-#     # 1. Arrange
-#     filename = "Adaptable Security Maturity Assessment and Standardization for Digital SMEs.pdf"
-#     # Read the actual full content from the MARKDOWN file to mock accurately
-#     md_path = Path("ai_researcher/data/processed/markdown/Adaptable Security Maturity Assessment and Standardization for Digital SMEs.md") # Use MD file
-#     pdf_filename_meta = "Adaptable Security Maturity Assessment and Standardization for Digital SMEs.pdf" # Filename from metadata
-#     try:
-#         # This uses a synchronous read for test setup simplicity
-#         full_md_content = md_path.read_text(encoding='utf-8')
-#     except FileNotFoundError:
-#         pytest.fail(f"Test Markdown file not found at {md_path}")
-#     except Exception as e:
-#          pytest.fail(f"Failed to read test Markdown {md_path}: {e}")
-#
-#
-#     # Mock chunks from Section 2.2 (adjacent) - with extra whitespace/newlines
-#     chunk2_text = """The European Digital SME Alliance focuses on two
-# challenges of SMEs: cybersecurity and standardization
-# that are to be addressed by distinguishing the SME
-# categories.""" # Note the newlines
-#     chunk3_text = """The categorization in Table 1 takes into
-# account the different security requirements of digital
-# SMEs that originate from their various roles in the
-# digital ecosystem.""" # Note the newlines
-#
-#     mock_chunks = [
-#         {
-#             "id": "adapt_sme_chunk2",
-#             "text": chunk2_text,
-#             "metadata": { "original_filename": filename, "doc_id": "adapt_sme", "chunk_id": 15 } # Example metadata
-#         },
-#         {
-#             "id": "adapt_sme_chunk3",
-#             "text": chunk3_text,
-#             "metadata": { "original_filename": filename, "doc_id": "adapt_sme", "chunk_id": 16 } # Example metadata
-#         }
-#     ]
-#
-#     monkeypatch.setattr(config, 'RESEARCH_NOTE_CONTENT_LIMIT', 300) # Window size
-#     monkeypatch.setattr(config, 'MAX_PLANNING_CONTEXT_CHARS', 1000) # Max merged window size
-#
-#     # Mock _read_full_document_if_needed to return the actual MD content when PDF filename is requested
-#     mock_read_result = (full_md_content, {"tool_name": "read_full_document"}, pdf_filename_meta)
-#     research_agent._read_full_document_if_needed.return_value = mock_read_result
-#
-#     # 2. Act
-#     # Use the PDF filename from metadata, as the main code does
-#     windows = await research_agent._extract_content_windows(pdf_filename_meta, mock_chunks)
-#
-#     # 3. Assert
-#     research_agent._read_full_document_if_needed.assert_awaited_once()
-#     assert len(windows) == 1 # Should merge into one window
-#
-#     merged_window = windows[0]
-#     # Check that the merged window contains parts of both original (unnormalized) chunks
-#     # We check the unnormalized text because the window extraction uses original content
-#     assert "European Digital SME Alliance focuses on two" in merged_window["content"]
-#     assert "challenges of SMEs: cybersecurity and standardization" in merged_window["content"]
-#     assert "distinguishing the SME \ncategories." in merged_window["content"] # Check with original newline
-#     assert "categorization in Table 1 takes into" in merged_window["content"]
-#     assert "roles in the \ndigital ecosystem." in merged_window["content"] # Check with original newline
-#
-#     # Check flags (assuming these chunks are not at the very start/end of the full PDF)
-#     assert merged_window["beginning_omitted"] is True
-#     assert merged_window["end_omitted"] is True
-#
-#     # Optional: Check length is reasonable (around window_size, but merge might extend it)
-#     # The exact length depends on the precise location found after normalization.
-#     # Let's check it's not excessively large or small.
-#     assert 200 < len(merged_window["content"]) < 500 # Rough check based on window size 300
-
-
 # --- Tests for _generate_note_from_content ---
 
 @pytest.mark.asyncio
@@ -502,10 +399,7 @@ async def test_generate_note_relevant(research_agent):
     # 1. Arrange
     # Mock LLM to return plain text content directly
     mock_llm_response_content = "This is the relevant note content."
-    mock_choice = MagicMock()
-    mock_choice.message.content = mock_llm_response_content
-    mock_llm_response_obj = MagicMock()
-    mock_llm_response_obj.choices = [mock_choice]
+    mock_llm_response_obj = LLMResponse([Choice(Message(mock_llm_response_content))])
     # Configure the agent's mocked _call_llm
     research_agent._call_llm.return_value = (mock_llm_response_obj, {"model_used": "test_model"})
 
@@ -544,10 +438,7 @@ async def test_generate_note_irrelevant(research_agent):
     # 1. Arrange
     # Mock LLM to return empty string
     mock_llm_response_content = ""
-    mock_choice = MagicMock()
-    mock_choice.message.content = mock_llm_response_content
-    mock_llm_response_obj = MagicMock()
-    mock_llm_response_obj.choices = [mock_choice]
+    mock_llm_response_obj = LLMResponse([Choice(Message(mock_llm_response_content))])
     research_agent._call_llm.return_value = (mock_llm_response_obj, {"model_used": "test_model"})
 
     # 2. Act
@@ -593,10 +484,7 @@ async def test_generate_note_context_flags_in_prompt(research_agent):
     # 1. Arrange
     # Mock LLM to return empty string (we only care about the prompt)
     mock_llm_response_content = ""
-    mock_choice = MagicMock()
-    mock_choice.message.content = mock_llm_response_content
-    mock_llm_response_obj = MagicMock()
-    mock_llm_response_obj.choices = [mock_choice]
+    mock_llm_response_obj = LLMResponse([Choice(Message(mock_llm_response_content))])
     research_agent._call_llm.return_value = (mock_llm_response_obj, {"model_used": "test_model"})
 
     source_metadata_flags = {"beginning_omitted": True, "end_omitted": False, "other": "data"}
@@ -625,54 +513,22 @@ async def test_generate_note_context_flags_in_prompt(research_agent):
     assert "Context Note:" not in prompt_arg
 
 
-# --- NEW TEST ---
-    @pytest.mark.skip(reason="Test data file is missing")
-    @pytest.mark.asyncio
-    async def test_extract_content_windows_real_markdown_merging(research_agent, monkeypatch):
-        """
-        Test window extraction and merging using real markdown content and chunks.
-        Uses 1f8c82f6.md and chunks 10, 11, 12.
-        """
+@pytest.mark.skip(reason="Test data file is missing")
+@pytest.mark.asyncio
+async def test_extract_content_windows_real_markdown_merging(research_agent, monkeypatch, bench_markdown, bench_chunk_spans):
+    """
+    Test window extraction and merging using real markdown content and chunks.
+    Uses 1f8c82f6.md and chunks 10, 11, 12.
+    """
     # 1. Arrange
-    markdown_path = Path("ai_researcher/data/processed/markdown/1f8c82f6.md")
+    full_markdown_content = bench_markdown
     pdf_filename_meta = "Benders-Decomposition-with-Delayed-Disaggregation-_2024_European-Journal-of-.pdf" # From metadata
     doc_id = "1f8c82f6"
 
-    try:
-        full_markdown_content = markdown_path.read_text(encoding='utf-8')
-    except FileNotFoundError:
-        pytest.fail(f"Test Markdown file not found at {markdown_path}")
-    except Exception as e:
-        pytest.fail(f"Failed to read test Markdown {markdown_path}: {e}")
-
-    # Define the chunks based on the selected text snippets
-    # IMPORTANT: Extract the exact text from the read content to ensure match
-    # Find start/end markers or unique phrases to locate the snippets accurately
-    # (These markers are illustrative; adjust based on actual MD content)
-    start_marker_10 = "CBD has emerged as a practical way"
-    end_marker_10 = "dual variables are non-zero."
-    start_index_10 = full_markdown_content.find(start_marker_10)
-    end_index_10 = full_markdown_content.find(end_marker_10) + len(end_marker_10)
-    if start_index_10 == -1 or end_index_10 == -1 + len(end_marker_10):
-        pytest.fail("Could not find markers for chunk 10 in the markdown file.")
-    chunk10_text = full_markdown_content[start_index_10:end_index_10]
-
-    start_marker_11 = "Classical Benders Decomposition can be applied"
-    end_marker_11 = "feasible solution to the master problem."
-    start_index_11 = full_markdown_content.find(start_marker_11)
-    end_index_11 = full_markdown_content.find(end_marker_11) + len(end_marker_11)
-    if start_index_11 == -1 or end_index_11 == -1 + len(end_marker_11):
-         pytest.fail("Could not find markers for chunk 11 in the markdown file.")
-    chunk11_text = full_markdown_content[start_index_11:end_index_11]
-
-    start_marker_12 = "A core contribution of this work regards *disaggregation*" # Corrected marker with markdown
-    end_marker_12 = "facility location problems." # Use exact end marker
-    start_index_12 = full_markdown_content.find(start_marker_12)
-    end_index_12 = full_markdown_content.find(end_marker_12) + len(end_marker_12)
-    if start_index_12 == -1 or end_index_12 == -1 + len(end_marker_12):
-         pytest.fail("Could not find markers for chunk 12 in the markdown file.")
-    chunk12_text = full_markdown_content[start_index_12:end_index_12]
-
+    # Exact chunk texts, cut at the offsets located once per session
+    chunk10_text, chunk11_text, chunk12_text = (
+        full_markdown_content[slice(*bench_chunk_spans[chunk_number])] for chunk_number in (10, 11, 12)
+    )
 
     mock_chunks = [
         {
@@ -711,12 +567,16 @@ async def test_generate_note_context_flags_in_prompt(research_agent):
 
     # Check that the merged window contains parts of all three original chunks
     # Use fragments to avoid issues with subtle whitespace differences in the source MD, check against NORMALIZED content
-    assert "CBD has emerged as a practical way" in merged_window["content"] # From chunk 10
-    assert "dual variables are non-zero." in merged_window["content"] # End of chunk 10
-    assert "Classical Benders Decomposition can be applied" in merged_window["content"] # From chunk 11
-    assert "fixed and feasible solution to the master problem." in merged_window["content"] # End of chunk 11
-    assert "A core contribution of this work regards *disaggregation*" in merged_window["content"] # From chunk 12 (INCLUDE MARKDOWN *)
-    assert "quadratic facility location problems." in merged_window["content"] # End of chunk 12
+    expected_fragments = (
+        "CBD has emerged as a practical way", # From chunk 10
+        "dual variables are non-zero.", # End of chunk 10
+        "Classical Benders Decomposition can be applied", # From chunk 11
+        "fixed and feasible solution to the master problem.", # End of chunk 11
+        "A core contribution of this work regards *disaggregation*", # From chunk 12 (INCLUDE MARKDOWN *)
+        "quadratic facility location problems.", # End of chunk 12
+    )
+    missing_fragments = [fragment for fragment in expected_fragments if fragment not in merged_window["content"]]
+    assert not missing_fragments, f"Merged window is missing fragments: {missing_fragments}"
 
     # Check flags (assuming these chunks are not at the very start/end of the full NORMALIZED MD)
     assert merged_window["beginning_omitted"] is True
@@ -0,0 +1,95 @@
+import unittest
+from pathlib import Path
+import sys
+
+import numpy as np
+
+# Add project root to sys.path for imports
+project_root = Path(__file__).resolve().parents[2] # Go up two levels from tests/core_rag
+sys.path.insert(0, str(project_root))
+
+from ai_researcher.core_rag.embedding_cache import ChunkEmbeddingCache
+
+
+class FakeEmbedder:
+    """Mimics TextEmbedder.embed_chunks and records the texts it was asked to embed."""
+
+    def __init__(self):
+        self.calls = []
+
+    def embed_chunks(self, chunks):
+        self.calls.append([chunk["text"] for chunk in chunks])
+        for chunk in chunks:
+            value = float(len(chunk["text"]))
+            chunk["embeddings"] = {"dense": [value] * 4, "sparse": {len(chunk["text"]): 1.0}}
+        return chunks
+
+
+def make_chunks(*texts):
+    return [{"text": text, "metadata": {"chunk_id": i}} for i, text in enumerate(texts)]
+
+
+class TestChunkEmbeddingCache(unittest.TestCase):
+
+    def test_reprocessed_document_is_served_from_cache(self):
+        cache = ChunkEmbeddingCache(max_entries=100)
+        embedder = FakeEmbedder()
+
+        first = cache.embed_chunks(make_chunks("alpha", "beta"), embedder.embed_chunks)
+        second = cache.embed_chunks(make_chunks("alpha", "beta"), embedder.embed_chunks)
+
+        self.assertEqual(embedder.calls, [["alpha", "beta"]])
+        self.assertEqual((cache.hits, cache.misses), (2, 2))
+        for before, after in zip(first, second):
+            np.testing.assert_array_equal(before["embeddings"]["dense"], after["embeddings"]["dense"])
+            self.assertEqual(before["embeddings"]["sparse"], after["embeddings"]["sparse"])
+
+    def test_only_new_and_distinct_texts_are_embedded(self):
+        cache = ChunkEmbeddingCache(max_entries=100)
+        embedder = FakeEmbedder()
+        cache.embed_chunks(make_chunks("alpha"), embedder.embed_chunks)
+
+        chunks = cache.embed_chunks(make_chunks("alpha", "gamma", "gamma"), embedder.embed_chunks)
+
+        self.assertEqual(embedder.calls[-1], ["gamma"])
+        self.assertTrue(all("embeddings" in chunk for chunk in chunks))
+        # Chunks keep their own metadata and never share mutable embeddings
+        self.assertEqual([chunk["metadata"]["chunk_id"] for chunk in chunks], [0, 1, 2])
+        self.assertIsNot(chunks[1]["embeddings"]["sparse"], chunks[2]["embeddings"]["sparse"])
+
+    def test_failed_placeholders_are_not_cached(self):
+        cache = ChunkEmbeddingCache(max_entries=100)
+
+        def failing_embedder(chunks):
+            for chunk in chunks:
+                chunk["embeddings"] = {"dense": [0.0] * 4, "sparse": {}}
+            return chunks
+
+        cache.embed_chunks(make_chunks("alpha"), failing_embedder)
+
+        self.assertEqual(len(cache), 0)
+
+    def test_least_recently_used_entries_are_evicted(self):
+        cache = ChunkEmbeddingCache(max_entries=2)
+        embedder = FakeEmbedder()
+        cache.embed_chunks(make_chunks("a", "bb"), embedder.embed_chunks)
+        cache.embed_chunks(make_chunks("a"), embedder.embed_chunks)
+        cache.embed_chunks(make_chunks("ccc"), embedder.embed_chunks)
+
+        cache.embed_chunks(make_chunks("a", "bb"), embedder.embed_chunks)
+
+        self.assertEqual(len(cache), 2)
+        self.assertEqual(embedder.calls[-1], ["bb"])
+
+    def test_disabled_cache_passes_through(self):
+        cache = ChunkEmbeddingCache(max_entries=0)
+        embedder = FakeEmbedder()
+        cache.embed_chunks(make_chunks("alpha"), embedder.embed_chunks)
+        cache.embed_chunks(make_chunks("alpha"), embedder.embed_chunks)
+
+        self.assertEqual(len(embedder.calls), 2)
+        self.assertEqual(len(cache), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()